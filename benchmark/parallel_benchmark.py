@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+from board.perft import REFERENCE_POSITIONS
+from board.position import Position
+from chess_ml.perceptron import Perceptron
+from chess_ml import search, transposition, ordering, limits, parallel
+
+
+def time_to_depth(run, depth):
+    """
+    Times searches of the reference positions to a fixed depth
+    :param run: function taking position and search limits, that searches
+    :param depth: Depth to search to
+    :return: list of seconds for each reference position
+    """
+    seconds = []
+    for _, fen, _ in REFERENCE_POSITIONS:
+        position = Position(fen, "bitboard")
+        tic = time.time()
+        run(position, limits.SearchLimits(max_depth=depth))
+        seconds.append(time.time() - tic)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures time-to-depth of the parallel search as workers are added")
+    parser.add_argument("--depth", type=int, default=4, help="Depth to search to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Most workers to try")
+    parser.add_argument("--hash-mb", type=int, default=16, help="Megabytes for each transposition table")
+    args = parser.parse_args()
+
+    p_tron = Perceptron(REFERENCE_POSITIONS[0][1], "data/weights.npy")
+
+    def serial(position, search_limits):
+        search.Search(
+            position, p_tron, search_limits,
+            table=transposition.TranspositionTable(args.hash_mb), orderer=ordering.MoveOrderer()
+        ).run()
+
+    results = [["Serial", time_to_depth(serial, args.depth)]]
+    workers = 1
+    while workers <= args.workers:
+        parallel_search = parallel.ParallelSearch(workers, args.hash_mb)
+        results.append([
+            "{} workers".format(workers),
+            time_to_depth(lambda position, search_limits: parallel_search.run(position, p_tron, search_limits), args.depth)
+        ])
+        parallel_search.close()
+        workers *= 2
+
+    print("\nTime to depth {} ({} cores)".format(args.depth, os.cpu_count()))
+    base = sum(results[0][1])
+    for name, seconds in results:
+        print("{:<12} {:>8.2f} s  speedup: {:.2f}".format(name, sum(seconds), base / max(sum(seconds), 1e-9)))
+        for i in range(len(REFERENCE_POSITIONS)):
+            print("    {:<28} {:>8.2f} s".format(REFERENCE_POSITIONS[i][0], seconds[i]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import math
+import time
+import numpy as np
+import util.util as util
+from chess_ml.perceptron import Perceptron
+
+# Positions to evaluate in the benchmark
+FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+]
+
+
+def reference_sigmoid(x):
+    """
+    Scalar logistic function used by the loop-based forward pass
+    :param x: value to pass through logistic function
+    :return: Float between 0.0 and 1.0
+    """
+    try:
+        return 1 / (1 + math.exp(-x))
+    except OverflowError:
+        if x < -50.0:
+            return 1.0
+        return 0.0
+
+
+def reference_predict(weights, data):
+    """
+    Loop-based forward pass the perceptron used before it was vectorized
+    :param weights: list of float64 weight-matrices
+    :param data: a list with all the data
+    :return: chance of winning
+    """
+    output = 0.5
+    activation = data.copy()
+    for lr in range(len(weights)):
+        biased_data = util.add_bias(activation)
+        layer = np.zeros(len(weights[lr].T))
+        for to_node in range(len(layer)):
+            for w in range(len(weights[lr])):
+                b_data = biased_data[w]
+                if b_data != 0:
+                    layer[to_node] += b_data * weights[lr][w, to_node]
+            layer[to_node] = reference_sigmoid(layer[to_node])
+        if lr == len(weights) - 1:
+            output = layer[0]
+        else:
+            activation = layer.copy()
+    return output
+
+
+def reference_back_prop(weights, data, predict, target, eta=0.1):
+    """
+    Loop-based backpropagation the perceptron used before it was vectorized
+    :param weights: list of float64 weight-matrices
+    :param data: activations for each layer (input first)
+    :param predict: Predicted value
+    :param target: Target value
+    :param eta: Learning Rate
+    :return: new weights
+    """
+    ret_weights = []
+    full_data = [list(d) for d in data]
+    full_data.append([predict])
+    delta = [(predict - target) * predict * (1 - predict)]
+    for lr in range(-1, -len(weights)-1, -1):
+        new_weights = np.array([weights[lr][i] for i in range(len(weights[lr]))])
+        current_data = full_data[lr]
+        biased_activation = util.add_bias(full_data[lr - 1])
+        delta.append([])
+        for i in range(len(new_weights)):
+            delta[abs(lr)].append(
+                biased_activation[i] * (1 - biased_activation[i])
+            )
+            if lr == -1:
+                new_weights[i] = new_weights[i] - eta * delta[0] * current_data[0]
+                delta[abs(lr)][i] += delta[0] * weights[lr][i][0]
+            elif lr != -len(weights):
+                delta_times = 0.0
+                for j in range(len(new_weights[i])):
+                    new_weights[i][j] = weights[lr][i][j] - eta * delta[abs(lr+1)][j+1] * biased_activation[i]
+                    delta_times += delta[abs(lr+1)][j+1] * weights[lr][i][j]
+                delta[abs(lr)][i] = delta[abs(lr)][i] * delta_times
+            else:
+                if biased_activation[i] != 0:
+                    for j in range(len(new_weights[i])):
+                        new_weights[i][j] = weights[lr][i][j] - eta \
+                                            * delta[abs(lr+1)][j+1] * biased_activation[i]
+        ret_weights.append(new_weights)
+    ret_weights.reverse()
+    return ret_weights
+
+
+def seconds_per_call(func, min_time=1.0):
+    """
+    Runs func until min_time seconds have passed
+    :param func: function without arguments
+    :param min_time: Minimum time to run in seconds
+    :return: average seconds per call
+    """
+    calls = 0
+    tic = time.time()
+    while time.time() - tic < min_time:
+        func()
+        calls += 1
+    return (time.time() - tic) / calls
+
+
+def evaluations_per_second(func, data_list, min_time=1.0):
+    """
+    Runs func over data_list until min_time seconds have passed
+    :param func: function taking one data-entry
+    :param data_list: list of data to evaluate
+    :param min_time: Minimum time to run in seconds
+    :return: evaluations per second
+    """
+    evaluations = 0
+    tic = time.time()
+    while time.time() - tic < min_time:
+        for data in data_list:
+            func(data)
+        evaluations += len(data_list)
+    return evaluations / (time.time() - tic)
+
+
+def main():
+    p_tron = Perceptron(FENS[0], "data/weights.npy")
+    float64_weights = [np.asarray(w, dtype=np.float64) for w in util.get_weights("data/weights.npy")]
+    data_list = [list(util.get_data(fen)) for fen in FENS]
+
+    # Check that the vectorized forward pass gives the same outputs
+    max_diff = 0.0
+    for data in data_list:
+        new, _ = p_tron.predict(data)
+        old = reference_predict(float64_weights, data)
+        max_diff = max(max_diff, abs(new - old))
+    print("Largest difference between loop and vectorized output: {:.3e}".format(max_diff))
+
+    before = evaluations_per_second(lambda d: reference_predict(float64_weights, d), data_list)
+    after = evaluations_per_second(p_tron.predict, data_list)
+    print("Loop-based forward pass:   {:12.1f} evaluations/second".format(before))
+    print("Vectorized forward pass:   {:12.1f} evaluations/second".format(after))
+    print("Speedup:                   {:12.1f}x".format(after / before))
+
+    # Batched forward pass, with a batch about the size of the children of one node
+    batch = np.stack([util.get_data(FENS[i % len(FENS)]) for i in range(32)])
+    batched = evaluations_per_second(lambda d: p_tron.predict_batch(d), [batch]) * len(batch)
+    print("Batched forward pass (32): {:12.1f} evaluations/second".format(batched))
+
+    # Evaluating a child (1. e4) from the accumulator of its parent
+    accumulator = p_tron.new_accumulator(data_list[0])
+    parent = set(util.fen_to_indices(FENS[0]))
+    child = set(util.fen_to_indices("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 0"))
+    added = list(child - parent)
+    removed = list(parent - child)
+
+    def accumulated(_):
+        accumulator.push(added, removed)
+        p_tron.predict_accumulated(accumulator.get_values())
+        accumulator.pop()
+
+    after_accumulated = evaluations_per_second(accumulated, [None])
+    print("Accumulated forward pass:  {:12.1f} evaluations/second".format(after_accumulated))
+    print("Speedup over vectorized:   {:12.1f}x".format(after_accumulated / after))
+
+    # The accumulator has to give the same output as a full forward pass of the child
+    child_data = util.get_data("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 0")
+    accumulator.push(added, removed)
+    max_diff = abs(p_tron.predict_accumulated(accumulator.get_values())[0] - p_tron.predict(child_data)[0])
+    accumulator.pop()
+    print("Largest difference between accumulated and vectorized output: {:.3e}".format(max_diff))
+
+    # First layer from scratch against updating it with push/pop
+    first_layer = p_tron.weights[0]
+    full = seconds_per_call(lambda: child_data @ first_layer[1:] - first_layer[0])
+    incremental = seconds_per_call(lambda: (accumulator.push(added, removed), accumulator.pop()))
+    print("First layer from scratch:  {:12.2f} us".format(full * 1e6))
+    print("First layer push/pop:      {:12.2f} us".format(incremental * 1e6))
+
+    # Check that the vectorized backpropagation gives the same update
+    output, activations = p_tron.predict(data_list[1])
+    new_weights = p_tron.back_prop(activations, output, 1.0)
+    old_weights = reference_back_prop(float64_weights, activations, output, 1.0)
+    max_diff = max(np.max(np.abs(new - old)) for new, old in zip(new_weights, old_weights))
+    print("Largest difference between loop and vectorized weight-update: {:.3e}".format(max_diff))
+
+    before = seconds_per_call(lambda: reference_back_prop(float64_weights, activations, output, 1.0))
+    after = seconds_per_call(lambda: p_tron.back_prop(activations, output, 1.0))
+    outputs, batch_activations = p_tron.predict_batch(batch)
+    after_batch = seconds_per_call(lambda: p_tron.back_prop(batch_activations, outputs, np.ones(len(batch))))
+    print("Loop-based training step:  {:12.3f} ms".format(before * 1000))
+    print("Vectorized training step:  {:12.3f} ms".format(after * 1000))
+    print("Mini-batch of 32:          {:12.3f} ms".format(after_batch * 1000))
+
+
+if __name__ == "__main__":
+    main()
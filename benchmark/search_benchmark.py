@@ -0,0 +1,58 @@
+import argparse
+import time
+from board.perft import REFERENCE_POSITIONS
+from board.position import Position
+from chess_ml.perceptron import Perceptron
+from chess_ml import search, transposition, ordering, limits
+
+
+def search_to_depth(fen, p_tron, depth, table=None, orderer=None, move_generator="bitboard"):
+    """
+    Searches a position to a fixed depth without time limit
+    :param fen: fen-string
+    :param p_tron: Perceptron to evaluate with
+    :param depth: Depth to search to
+    :param table: TranspositionTable or None
+    :param orderer: MoveOrderer or None
+    :param move_generator: "objects" or "bitboard"
+    :return: nodes searched, seconds used
+    """
+    position = Position(fen, move_generator)
+    s = search.Search(position, p_tron, limits.SearchLimits(max_depth=depth), table=table, orderer=orderer)
+    tic = time.time()
+    s.run()
+    return s.nodes, time.time() - tic
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts nodes searched to a fixed depth with and without move ordering")
+    parser.add_argument("--depth", type=int, default=3, help="Depth to search to")
+    parser.add_argument("--generator", default="bitboard", choices=["objects", "bitboard"], help="Move generator")
+    parser.add_argument("--hash-mb", type=int, default=16, help="Megabytes for the transposition table")
+    args = parser.parse_args()
+
+    p_tron = Perceptron(REFERENCE_POSITIONS[0][1], "data/weights.npy")
+    setups = [
+        ["Generated order", lambda: None, lambda: None],
+        ["Hash move", lambda: transposition.TranspositionTable(args.hash_mb), lambda: None],
+        ["Hash move, MVV-LVA, killers, history",
+         lambda: transposition.TranspositionTable(args.hash_mb), lambda: ordering.MoveOrderer()],
+    ]
+    results = []
+    for name, fen, _ in REFERENCE_POSITIONS:
+        row = [name]
+        for _, make_table, make_orderer in setups:
+            row.append(search_to_depth(fen, p_tron, args.depth, make_table(), make_orderer(), args.generator))
+        results.append(row)
+
+    print("\nNodes to depth {}".format(args.depth))
+    for i in range(len(setups)):
+        nodes = sum(row[i + 1][0] for row in results)
+        seconds = sum(row[i + 1][1] for row in results)
+        print("{:<40} {:>10} nodes {:>8.2f} s".format(setups[i][0], nodes, seconds))
+        for row in results:
+            print("    {:<36} {:>10} nodes {:>8.2f} s".format(row[0], row[i + 1][0], row[i + 1][1]))
+
+
+if __name__ == "__main__":
+    main()
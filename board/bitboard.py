@@ -0,0 +1,307 @@
+import util.util as util
+
+# Squares are numbered row * 8 + col like in the board-array, so bit 0 is a8 and bit 63 is h1
+WHITE = 0
+BLACK = 1
+
+ROOK_DIRECTIONS = [[-1, 0], [1, 0], [0, -1], [0, 1]]
+BISHOP_DIRECTIONS = [[-1, -1], [-1, 1], [1, -1], [1, 1]]
+PROMOTIONS = ["q", "r", "b", "n"]
+
+
+def step_attacks(steps):
+    """
+    Makes table of squares reached in one step from every square
+    :param steps: list of [row, col] steps
+    :return: list with a bitboard for each square
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        bb = 0
+        for step in steps:
+            r = row + step[0]
+            c = col + step[1]
+            if 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << (r * 8 + c)
+        table.append(bb)
+    return table
+
+
+def rays(direction):
+    """
+    Makes table of squares a sliding piece reaches on an empty board in one direction
+    :param direction: [row, col] step
+    :return: list with a bitboard for each square
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        bb = 0
+        r = row + direction[0]
+        c = col + direction[1]
+        while 0 <= r < 8 and 0 <= c < 8:
+            bb |= 1 << (r * 8 + c)
+            r += direction[0]
+            c += direction[1]
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = step_attacks([[-2, -1], [-2, 1], [-1, -2], [-1, 2], [1, -2], [1, 2], [2, -1], [2, 1]])
+KING_ATTACKS = step_attacks([[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]])
+# Squares attacked by a pawn standing on a square. White pawns move towards row 0
+PAWN_ATTACKS = [step_attacks([[-1, -1], [-1, 1]]), step_attacks([[1, -1], [1, 1]])]
+# Rays for each direction, and if squares get higher numbers along the ray
+RAYS = [[rays(d), d[0] > 0 or (d[0] == 0 and d[1] > 0)] for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS]
+ROOK_RAYS = RAYS[:4]
+BISHOP_RAYS = RAYS[4:]
+# Squares on a line (rank, file or diagonal) from each square. Only pieces on these lines can be pinned to a king there
+LINES = [0] * 64
+for table, _ in RAYS:
+    for sq in range(64):
+        LINES[sq] |= table[sq]
+# Type of each piece for a color, in the order pawn, knight, bishop, rook, queen, king
+PIECE_TYPES = ["PNBRQK", "pnbrqk"]
+
+# Castling: [right, king-square, rook-square, squares that must be empty, squares that can't be attacked]
+CASTLING = [
+    ["K", 60, 63, [61, 62], [60, 61, 62]],
+    ["Q", 60, 56, [57, 58, 59], [60, 59, 58]],
+    ["k", 4, 7, [5, 6], [4, 5, 6]],
+    ["q", 4, 0, [1, 2, 3], [4, 3, 2]],
+]
+
+
+def slide(sq, occupied, directions):
+    """
+    Gets squares attacked by a sliding piece. The first piece in each direction blocks the ray
+    :param sq: Square of piece
+    :param occupied: Bitboard of all pieces
+    :param directions: ROOK_RAYS or BISHOP_RAYS
+    :return: bitboard of attacked squares
+    """
+    attacks = 0
+    for table, increasing in directions:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if increasing:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
+
+
+def squares(bb):
+    """
+    Gets the squares set in a bitboard
+    :param bb: bitboard
+    :return: list of squares
+    """
+    ret = []
+    while bb:
+        low = bb & -bb
+        ret.append(low.bit_length() - 1)
+        bb ^= low
+    return ret
+
+
+def to_position(sq):
+    """
+    Converts square to position in board-array
+    :param sq: Square number
+    :return: [row, col]
+    """
+    return [sq >> 3, sq & 7]
+
+
+class Bitboards:
+    """
+    Bitboards for a position: one 64-bit mask for each piece-type and color
+    """
+    def __init__(self, position):
+        """
+        Gets bitboards from a position, which keeps them up to date as moves are made
+        :param position: Position (or Board)
+        """
+        self.pieces = position.get_bitboards()
+        self.colors = [0, 0]
+        for t in "PNBRQK":
+            self.colors[WHITE] |= self.pieces[t]
+            self.colors[BLACK] |= self.pieces[t.lower()]
+        self.occupied = self.colors[WHITE] | self.colors[BLACK]
+        self.us = WHITE if position.get_bw() == "w" else BLACK
+        self.castle = position.get_castle()
+        self.en_passant = -1
+        if position.get_en_passent() != "-":
+            row, col = util.string_position_to_array_position(position.get_en_passent())
+            self.en_passant = row * 8 + col
+
+    def piece(self, t, color):
+        """
+        Gets bitboard for a piece-type
+        :param t: Type of piece in uppercase
+        :param color: WHITE or BLACK
+        :return: bitboard
+        """
+        return self.pieces[t if color == WHITE else t.lower()]
+
+    def attacked(self, sq, by, occupied=None, removed=0):
+        """
+        Checks if a square is attacked
+        :param sq: Square to check
+        :param by: Color of attacking pieces
+        :param occupied: Bitboard of all pieces. Default is the pieces on the board
+        :param removed: Bitboard of attacking pieces to ignore (e.g. captured)
+        :return: True if square is attacked
+        """
+        if occupied is None:
+            occupied = self.occupied
+        keep = ~removed
+        pieces = self.pieces
+        pawn, knight, bishop, rook, queen, king = PIECE_TYPES[by]
+        if PAWN_ATTACKS[1 - by][sq] & pieces[pawn] & keep:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[knight] & keep:
+            return True
+        if KING_ATTACKS[sq] & pieces[king] & keep:
+            return True
+        queens = pieces[queen]
+        if slide(sq, occupied, BISHOP_RAYS) & (pieces[bishop] | queens) & keep:
+            return True
+        if slide(sq, occupied, ROOK_RAYS) & (pieces[rook] | queens) & keep:
+            return True
+        return False
+
+    def in_check(self):
+        """
+        Checks if the player to move is in check
+        :return: True if check
+        """
+        king = self.piece("K", self.us)
+        if not king:
+            return False
+        return self.attacked(king.bit_length() - 1, 1 - self.us)
+
+    def is_legal(self, fr, to, captured_sq):
+        """
+        Checks that a move does not leave own king attacked
+        :param fr: Square to move from
+        :param to: Square to move to
+        :param captured_sq: Square of captured piece, or -1 if nothing is captured
+        :return: True if move is legal
+        """
+        king = self.piece("K", self.us)
+        if not king:
+            return True
+        fr_bit = 1 << fr
+        to_bit = 1 << to
+        removed = 1 << captured_sq if captured_sq >= 0 else 0
+        occupied = (self.occupied & ~fr_bit & ~removed) | to_bit
+        king_sq = to if king & fr_bit else king.bit_length() - 1
+        return not self.attacked(king_sq, 1 - self.us, occupied, removed)
+
+    def pseudo_legal_moves(self):
+        """
+        Gets moves for the player to move without checking if they leave the king attacked
+        :return: list of [from, to, captured square, promote]
+        """
+        us = self.us
+        them = 1 - us
+        own = self.colors[us]
+        enemy = self.colors[them]
+        empty = ~self.occupied
+        moves = []
+
+        # Pawns
+        forward = -8 if us == WHITE else 8
+        start_row = 6 if us == WHITE else 1
+        last_row = 0 if us == WHITE else 7
+        ep_bit = 1 << self.en_passant if self.en_passant >= 0 else 0
+        for fr in squares(self.piece("P", us)):
+            targets = []
+            to = fr + forward
+            if (1 << to) & empty:
+                targets.append([to, -1])
+                if fr >> 3 == start_row and (1 << (to + forward)) & empty:
+                    targets.append([to + forward, -1])
+            for to in squares(PAWN_ATTACKS[us][fr] & enemy):
+                targets.append([to, to])
+            if PAWN_ATTACKS[us][fr] & ep_bit:
+                targets.append([self.en_passant, self.en_passant - forward])
+            for to, captured_sq in targets:
+                if to >> 3 == last_row:
+                    for p in PROMOTIONS:
+                        moves.append([fr, to, captured_sq, p])
+                else:
+                    moves.append([fr, to, captured_sq, None])
+
+        # Knights, bishops, rooks, queens and king
+        for t in "NBRQK":
+            for fr in squares(self.piece(t, us)):
+                if t == "N":
+                    targets = KNIGHT_ATTACKS[fr]
+                elif t == "B":
+                    targets = slide(fr, self.occupied, BISHOP_RAYS)
+                elif t == "R":
+                    targets = slide(fr, self.occupied, ROOK_RAYS)
+                elif t == "Q":
+                    targets = slide(fr, self.occupied, BISHOP_RAYS) | slide(fr, self.occupied, ROOK_RAYS)
+                else:
+                    targets = KING_ATTACKS[fr]
+                for to in squares(targets & ~own):
+                    moves.append([fr, to, to if (1 << to) & enemy else -1, None])
+
+        # Castling
+        for right, king_sq, rook_sq, between, safe in CASTLING:
+            if right not in self.castle or (right.isupper() != (us == WHITE)):
+                continue
+            if not self.piece("K", us) & (1 << king_sq) or not self.piece("R", us) & (1 << rook_sq):
+                continue
+            if any(self.occupied & (1 << sq) for sq in between):
+                continue
+            if any(self.attacked(sq, them) for sq in safe):
+                continue
+            moves.append([king_sq, safe[-1], -1, None])
+        return moves
+
+    def legal_moves(self):
+        """
+        Gets every legal move for the player to move
+        :return: list of [from, to, promote] with from and to as [row, col]
+        """
+        moves = []
+        king = self.piece("K", self.us)
+        king_sq = king.bit_length() - 1
+        # When not in check, only moves of the king, of pieces on a line from the king, or taking en-passant
+        # can leave the king attacked. Other moves are legal without testing
+        safe = king and not self.attacked(king_sq, 1 - self.us)
+        lines = LINES[king_sq] if king else 0
+        for fr, to, captured_sq, promote in self.pseudo_legal_moves():
+            if (
+                    (safe and fr != king_sq and not (lines >> fr) & 1 and captured_sq in (-1, to))
+                    or self.is_legal(fr, to, captured_sq)
+            ):
+                moves.append([to_position(fr), to_position(to), promote])
+        return moves
+
+
+def generate_legal_moves(position):
+    """
+    Returns every legal move for the player to move, using bitboards
+    :param position: Position (or Board)
+    :return: list of [from, to, promote] with from and to as [row, col], promote is None if not promoting
+    """
+    return Bitboards(position).legal_moves()
+
+
+def in_check(position):
+    """
+    Checks if the player to move is in check, using bitboards
+    :param position: Position (or Board)
+    :return: True if check
+    """
+    return Bitboards(position).in_check()
@@ -32,15 +32,16 @@ def add_move_for_straight_line_pieces(move_matrix, row, col, game_board, piece,
     return moves
 
 
-def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=True):
+def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=True, safety=None):
     """
     Returns a list of legal moved based on position on board
     :param en_passant: String to tell if en passant or not
     :param castle: String that contains info of castling-rights
-    :param rec: Recursion for check
+    :param rec: Recursion for check. If False, moves that leave the king in check are not removed
     :param game_board: 2d-array of game-board
     :param position: list with position to check legal moves from
     :param bw: Black or White to move (for check-checking)
+    :param safety: KingSafety for the color of the piece. Made if None, pass it when getting moves for many pieces
     :return: List of legal moves, None if no piece on position
     """
     row = position[0]
@@ -55,6 +56,8 @@ def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=Tru
     # If wrong color
     if (piece.get_type().islower() and bw == "w") or (piece.get_type().isupper() and bw == "b"):
         return moves
+    if rec and safety is None:
+        safety = KingSafety(game_board, "w" if piece.get_type().isupper() else "b")
 
     # White Pawn
     if piece.get_type() == "P":
@@ -74,7 +77,7 @@ def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=Tru
         else:  # Will be promoted
             for p in ["Q", "R", "N", "B"]:
                 game_board[row, col].get_content().set_type(p)
-                for m in legal_moves(game_board, position, bw, castle, en_passant, rec):
+                for m in legal_moves(game_board, position, bw, castle, en_passant, rec, safety):
                     moves.append(m)
             # Change back to pawn
             game_board[row, col].get_content().set_type("P")
@@ -98,7 +101,7 @@ def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=Tru
         else:  # Will be promoted
             for p in ["q", "r", "n", "b"]:
                 game_board[row, col].get_content().set_type(p)
-                for m in legal_moves(game_board, position, bw, castle, en_passant, rec):
+                for m in legal_moves(game_board, position, bw, castle, en_passant, rec, safety):
                     moves.append(m)
             # Change back to pawn
             game_board[row, col].get_content().set_type("p")
@@ -206,49 +209,235 @@ def legal_moves(game_board, position, bw, castle="KQkq", en_passant="-", rec=Tru
                 piece.get_type().islower() and position == [0, 4]
                 or
                 piece.get_type().isupper() and position == [7, 4])):
-            moves = castling(game_board, castle, moves, piece.get_type())
+            moves = castling(game_board, castle, moves, piece.get_type(), safety)
 
     # Cannot move into check
-    moves = delete_discovered_check(moves, position, game_board, bw, rec)
+    if rec:
+        moves = delete_discovered_check(moves, position, game_board, safety)
 
     return moves
 
 
-def delete_discovered_check(moves, position, game_board, bw, rec):
+STRAIGHT = [[-1, 0], [1, 0], [0, -1], [0, 1]]
+DIAGONAL = [[-1, -1], [-1, 1], [1, -1], [1, 1]]
+KNIGHT_STEPS = [[-2, -1], [-2, 1], [-1, -2], [-1, 2], [1, -2], [1, 2], [2, -1], [2, 1]]
+
+
+def is_enemy(piece_type, bw):
+    """
+    Checks if piece belongs to the other player
+    :param piece_type: type of piece
+    :param bw: Black or White
+    :return: True if piece is the other color than bw
+    """
+    return piece_type.islower() if bw == "w" else piece_type.isupper()
+
+
+def attacked_squares(game_board, row, col, see_through=None):
+    """
+    Gets the squares a piece attacks (including squares with pieces of its own color)
+    :param game_board: array of board
+    :param row: Which row the piece is on
+    :param col: Which column the piece is on
+    :param see_through: [row, col] of a square that lines of attack go through as if it was empty
+    :return: list of [row, col]
+    """
+    t = game_board[row, col].get_content().get_type()
+    squares = []
+    if t.lower() == "p":
+        direction = -1 if t.isupper() else 1
+        for c in [col - 1, col + 1]:
+            if 0 <= row + direction < 8 and 0 <= c < 8:
+                squares.append([row + direction, c])
+    elif t.lower() == "n" or t.lower() == "k":
+        for step in (KNIGHT_STEPS if t.lower() == "n" else STRAIGHT + DIAGONAL):
+            if 0 <= row + step[0] < 8 and 0 <= col + step[1] < 8:
+                squares.append([row + step[0], col + step[1]])
+    else:
+        directions = []
+        if t.lower() in ["r", "q"]:
+            directions += STRAIGHT
+        if t.lower() in ["b", "q"]:
+            directions += DIAGONAL
+        for d in directions:
+            r = row + d[0]
+            c = col + d[1]
+            while 0 <= r < 8 and 0 <= c < 8:
+                squares.append([r, c])
+                if game_board[r, c].get_content() is not None and [r, c] != see_through:
+                    break
+                r += d[0]
+                c += d[1]
+    return squares
+
+
+def square_attacked(game_board, square, bw, empty=(), filled=()):
+    """
+    Checks if a square is attacked by the other player, by looking out from the square
+    :param game_board: array of board
+    :param square: [row, col] of square
+    :param bw: Black or White, the player that is attacked
+    :param empty: squares to treat as empty (as tuples)
+    :param filled: squares to treat as blocked by a piece of bw (as tuples)
+    :return: True if attacked
+    """
+    row = square[0]
+    col = square[1]
+
+    def enemy(r, c, types):
+        if (r, c) in empty or (r, c) in filled:
+            return False
+        content = game_board[r, c].get_content()
+        return content is not None and is_enemy(content.get_type(), bw) and content.get_type().lower() in types
+
+    for step in KNIGHT_STEPS:
+        if 0 <= row + step[0] < 8 and 0 <= col + step[1] < 8 and enemy(row + step[0], col + step[1], "n"):
+            return True
+    for step in STRAIGHT + DIAGONAL:
+        if 0 <= row + step[0] < 8 and 0 <= col + step[1] < 8 and enemy(row + step[0], col + step[1], "k"):
+            return True
+    pawn_row = row - 1 if bw == "w" else row + 1
+    for c in [col - 1, col + 1]:
+        if 0 <= pawn_row < 8 and 0 <= c < 8 and enemy(pawn_row, c, "p"):
+            return True
+    for directions, types in [[STRAIGHT, "rq"], [DIAGONAL, "bq"]]:
+        for d in directions:
+            r = row + d[0]
+            c = col + d[1]
+            while 0 <= r < 8 and 0 <= c < 8:
+                if (r, c) in filled:
+                    break
+                if (r, c) not in empty and game_board[r, c].get_content() is not None:
+                    if enemy(r, c, types):
+                        return True
+                    break
+                r += d[0]
+                c += d[1]
+    return False
+
+
+class KingSafety:
+    """
+    What the other player does to the king of one player: which squares are attacked,
+    which pieces give check and which pieces are pinned to the king.
+    Made once for a position, so each move can be accepted or rejected without trying it on the board
+    """
+    def __init__(self, game_board, bw):
+        """
+        Finds attacked squares, checks and pins
+        :param game_board: array of board
+        :param bw: Black or White, the player whose king is looked at
+        """
+        self.bw = bw
+        king_square = find_king(game_board, bw)
+        self.king = king_square.get_position() if king_square is not None else None
+        # Squares attacked by the other player. Lines of attack go through the king,
+        # so the king can't step away from a rook or bishop along its line
+        self.attacked = [[False for _ in range(8)] for _ in range(8)]
+        # For each piece giving check: squares where it can be taken or blocked
+        self.checkers = []
+        # For each pinned piece (row, col): squares it can move to without leaving the line of the pin
+        self.pins = {}
+
+        for row in range(8):
+            for col in range(8):
+                content = game_board[row, col].get_content()
+                if content is not None and is_enemy(content.get_type(), bw):
+                    for r, c in attacked_squares(game_board, row, col, self.king):
+                        self.attacked[r][c] = True
+        if self.king is not None:
+            self.find_checks_and_pins(game_board)
+
+    def find_checks_and_pins(self, game_board):
+        """
+        Looks out from the king for pieces giving check and pinned pieces
+        :param game_board: array of board
+        :return:
+        """
+        row = self.king[0]
+        col = self.king[1]
+        for d in STRAIGHT + DIAGONAL:
+            sliders = "rq" if d in STRAIGHT else "bq"
+            line = []
+            pinned = None
+            r = row + d[0]
+            c = col + d[1]
+            while 0 <= r < 8 and 0 <= c < 8:
+                line.append((r, c))
+                content = game_board[r, c].get_content()
+                if content is not None:
+                    if not is_enemy(content.get_type(), self.bw):
+                        if pinned is not None:
+                            break
+                        pinned = (r, c)
+                    else:
+                        if content.get_type().lower() in sliders:
+                            if pinned is None:
+                                self.checkers.append(set(line))
+                            else:
+                                self.pins[pinned] = set(line)
+                        break
+                r += d[0]
+                c += d[1]
+
+        for step in KNIGHT_STEPS:
+            r = row + step[0]
+            c = col + step[1]
+            if 0 <= r < 8 and 0 <= c < 8:
+                content = game_board[r, c].get_content()
+                if content is not None and content.get_type().lower() == "n" and is_enemy(content.get_type(), self.bw):
+                    self.checkers.append({(r, c)})
+        pawn_row = row - 1 if self.bw == "w" else row + 1
+        for c in [col - 1, col + 1]:
+            if 0 <= pawn_row < 8 and 0 <= c < 8:
+                content = game_board[pawn_row, c].get_content()
+                if content is not None and content.get_type().lower() == "p" and is_enemy(content.get_type(), self.bw):
+                    self.checkers.append({(pawn_row, c)})
+
+    def is_legal(self, game_board, fr, to):
+        """
+        Checks that a move doesn't leave the king in check
+        :param game_board: array of board
+        :param fr: [row, col] to move from
+        :param to: [row, col] to move to
+        :return: True if move is legal
+        """
+        if self.king is None:
+            return True
+        piece_type = game_board[fr[0], fr[1]].get_content().get_type()
+        target = (to[0], to[1])
+        if piece_type.lower() == "k":
+            return not self.attacked[to[0]][to[1]]
+        if len(self.checkers) > 1:
+            # Only the king can move out of double check
+            return False
+        start = (fr[0], fr[1])
+        if start in self.pins and target not in self.pins[start]:
+            return False
+        if piece_type.lower() == "p" and fr[1] != to[1] and game_board[to[0], to[1]].get_content() is None:
+            # En passant removes a pawn from another square than the one moved to
+            captured = (fr[0], to[1])
+            if self.checkers and target not in self.checkers[0] and captured not in self.checkers[0]:
+                return False
+            return not square_attacked(game_board, self.king, self.bw, empty=(start, captured), filled=(target,))
+        if self.checkers and target not in self.checkers[0]:
+            return False
+        return True
+
+
+def delete_discovered_check(moves, position, game_board, safety):
     """
-    Move piece to check if it discovers check
-    :param rec: Recursion, decides if we should go deeper or not
+    Removes moves that leave the king in check
     :param moves: list of moves
     :param position: position of piece
     :param game_board: board-array
-    :param bw: Black or White to move
+    :param safety: KingSafety for the color of the piece
     :return: List of new moves
     """
-    new_m = moves.copy()
-    # Try to move piece to see if it resolves the check
+    new_m = []
     for m in moves:
-        target_square = []
-
-        for j in range(len(m)):
-            target_square.append(
-                position[j] + m[j]
-            )
-        # Move piece
-        target_piece = game_board[target_square[0], target_square[1]].get_content()
-        game_board[target_square[0], target_square[1]].add_content(
-            game_board[position[0], position[1]].get_content()
-        )
-        game_board[position[0], position[1]].add_content()
-
-        # Check for check and delete move if still check
-        if check(game_board, bw, rec):
-            new_m.remove(m)
-
-        # Move piece back
-        game_board[position[0], position[1]].add_content(
-            game_board[target_square[0], target_square[1]].get_content()
-        )
-        game_board[target_square[0], target_square[1]].add_content(target_piece)
+        if safety.is_legal(game_board, position, [position[0] + m[0], position[1] + m[1]]):
+            new_m.append(m)
     return new_m
 
 
@@ -281,124 +470,62 @@ def check(game_board, bw, recursion=True):
     """
     king_square = find_king(game_board, bw)
     if king_square is not None and recursion:
-        for row in game_board:
-            for sqr in row:
-                if sqr.get_content() is not None:
-                    if (
-                            sqr.get_content().get_type().islower() and bw == "w"
-                    ) or (
-                            sqr.get_content().get_type().isupper() and bw == "b"
-                    ):
-                        moves = legal_moves(game_board, sqr.get_position(), "-", rec=False)
-                        for m in moves:
-                            target_pos = []
-                            for i in range(len(m)):
-                                target_pos.append(
-                                    sqr.get_position()[i] + m[i]
-                                )
-                            if target_pos == king_square.get_position():
-                                return True
+        return square_attacked(game_board, king_square.get_position(), bw)
     return False
 
 
-def castling(game_board, castle, move, piece):
+def castling(game_board, castle, move, piece, safety=None):
     """
-    Checks if we can castle and add move if we can
+    Checks if we can castle and add move if we can.
+    The rook must be in place, the king can't be in check and can't pass or land on an attacked square
     :param game_board: array of board
     :param castle: castle-string
     :param move: list of moves
     :param piece: piece to move (King)
+    :param safety: KingSafety for the color of the king. Made if None
     :return: updated list of moves
     """
     m = move
     if piece.isupper():
-        if "K" in castle:
-            if (
-                    game_board[7, 5].get_content() is None
-                    and
-                    game_board[7, 6].get_content() is None
-            ):
-                if (
-                        move_and_check_for_check(game_board, [7, 4], [7, 5], "w")
-                        and
-                        move_and_check_for_check(game_board, [7, 4], [7, 6], "w")
-                ):
-                    m.append([0, 2])
-        if "Q" in castle:
-            if (
-                    game_board[7, 3].get_content() is None
-                    and
-                    game_board[7, 2].get_content() is None
-                    and
-                    game_board[7, 1].get_content() is None
-            ):
-                if (
-                        move_and_check_for_check(game_board, [7, 4], [7, 3], "w")
-                        and
-                        move_and_check_for_check(game_board, [7, 4], [7, 2], "w")
-                        and
-                        move_and_check_for_check(game_board, [7, 4], [7, 1], "w")
-                ):
-                    m.append([0, -2])
-    if piece.islower():
-        if "k" in castle:
-            if (
-                    game_board[0, 5].get_content() is None
-                    and
-                    game_board[0, 6].get_content() is None
-            ):
-                if (
-                        move_and_check_for_check(game_board, [0, 4], [0, 5], "b")
-                        and
-                        move_and_check_for_check(game_board, [0, 4], [0, 6], "b")
-                ):
-                    m.append([0, 2])
-        if "q" in castle:
-            if (
-                    game_board[0, 3].get_content() is None
-                    and
-                    game_board[0, 2].get_content() is None
-                    and
-                    game_board[0, 1].get_content() is None
-            ):
-                if (
-                        move_and_check_for_check(game_board, [0, 4], [0, 3], "b")
-                        and
-                        move_and_check_for_check(game_board, [0, 4], [0, 2], "b")
-                        and
-                        move_and_check_for_check(game_board, [0, 4], [0, 1], "b")
-                ):
-                    m.append([0, -2])
+        bw = "w"
+        row = 7
+    else:
+        bw = "b"
+        row = 0
+    if safety is None:
+        safety = KingSafety(game_board, bw)
+    rook = "R" if piece.isupper() else "r"
+    if safety.checkers:
+        return m
+    if ("K" if piece.isupper() else "k") in castle:
+        if (
+                game_board[row, 5].get_content() is None
+                and
+                game_board[row, 6].get_content() is None
+                and
+                game_board[row, 7].get_content() is not None
+                and
+                game_board[row, 7].get_content().get_type() == rook
+        ):
+            if not safety.attacked[row][5] and not safety.attacked[row][6]:
+                m.append([0, 2])
+    if ("Q" if piece.isupper() else "q") in castle:
+        if (
+                game_board[row, 3].get_content() is None
+                and
+                game_board[row, 2].get_content() is None
+                and
+                game_board[row, 1].get_content() is None
+                and
+                game_board[row, 0].get_content() is not None
+                and
+                game_board[row, 0].get_content().get_type() == rook
+        ):
+            if not safety.attacked[row][3] and not safety.attacked[row][2]:
+                m.append([0, -2])
     return m
 
 
-def move_and_check_for_check(game_board, king_place, new_place, bw):
-    """
-    Helper-function for castling.
-    Checks that king is not moving into attacked square
-    :param game_board: The board
-    :param king_place: Where is the king?
-    :param new_place: Where we move to
-    :param bw: Black or White to move?
-    :return:
-    """
-    valid_move = True
-    # Move King
-    game_board[new_place[0], new_place[1]].add_content(
-        game_board[king_place[0], king_place[1]].get_content()
-    )
-    game_board[king_place[0], king_place[1]].add_content()
-    # Check for check
-    if check(game_board, bw):
-        valid_move = False
-    # Move King Back
-    game_board[king_place[0], king_place[1]].add_content(
-        game_board[new_place[0], new_place[1]].get_content()
-    )
-    game_board[new_place[0], new_place[1]].add_content()
-    return valid_move
-
-
 def add_en_passant(position, moves, en_passant):
     """
     Add move for en passant
@@ -430,3 +557,38 @@ def add_en_passant(position, moves, en_passant):
                         moves_2.append(move)
 
     return moves_2
+
+
+def generate_legal_moves(position):
+    """
+    Returns every legal move for the player to move, using the squares and pieces of the board
+    :param position: Position (or Board)
+    :return: list of [from, to, promote] with from and to as [row, col], promote is None if not promoting
+    """
+    game_board = position.get_board_array()
+    bw = position.get_bw()
+    safety = KingSafety(game_board, bw)
+    moves = []
+    for row in range(8):
+        for col in range(8):
+            content = game_board[row, col].get_content()
+            if content is None or is_enemy(content.get_type(), bw):
+                continue
+            fr = [row, col]
+            for m in legal_moves(game_board, fr, bw, position.get_castle(), position.get_en_passent(), safety=safety):
+                to = [row + m[0], col + m[1]]
+                if (content.get_type() == "P" and to[0] == 0) or (content.get_type() == "p" and to[0] == 7):
+                    for p in ["q", "r", "b", "n"]:
+                        moves.append([fr, to, p])
+                else:
+                    moves.append([fr, to, None])
+    return moves
+
+
+def in_check(position):
+    """
+    Checks if the player to move is in check, using the squares and pieces of the board
+    :param position: Position (or Board)
+    :return: True if check
+    """
+    return check(position.get_board_array(), position.get_bw())
@@ -12,8 +12,12 @@ class Game:
     """
     Class to setup and start a game
     """
-    def __init__(self):
-        self.b = board.Board(w, h)
+    def __init__(self, move_generator="objects"):
+        """
+        Initializes game
+        :param move_generator: "objects" or "bitboard", see Position
+        """
+        self.b = board.Board(w, h, move_generator=move_generator)
 
     def get_board(self):
         """
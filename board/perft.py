@@ -0,0 +1,156 @@
+import argparse
+import time
+from multiprocessing import Pool
+import util.util as util
+from board.position import Position
+
+# Reference positions with known number of leaf-nodes for depth 1, 2, 3, ...
+REFERENCE_POSITIONS = [
+    [
+        "Start position",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        [20, 400, 8902, 197281, 4865609]
+    ],
+    [
+        "Kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603]
+    ],
+    [
+        "En passant and pins",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624]
+    ],
+    [
+        "Promotion",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333]
+    ],
+    [
+        "Promotion and castling",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487]
+    ],
+    [
+        "Middle game",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594]
+    ],
+]
+
+
+def perft(position, depth):
+    """
+    Counts leaf-nodes of the move-tree
+    :param position: Position to count from. Is the same position when done
+    :param depth: How many moves to look ahead
+    :return: Number of leaf-nodes
+    """
+    if depth == 0:
+        return 1
+    moves = position.generate_legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def move_to_string(move):
+    """
+    Makes move to string, e.g. "e2e4" or "e7e8q"
+    :param move: [from, to, promote]
+    :return: String
+    """
+    ret = util.array_position_to_string_position(move[0]) + util.array_position_to_string_position(move[1])
+    if move[2] is not None:
+        ret += move[2]
+    return ret
+
+
+def perft_after_move(args):
+    """
+    Counts leaf-nodes after one root-move. Used by the process-pool
+    :param args: [fen, move, depth, move_generator]
+    :return: Number of leaf-nodes
+    """
+    fen, move, depth, move_generator = args
+    position = Position(fen, move_generator)
+    position.make_move(move)
+    return perft(position, depth - 1)
+
+
+def divide(fen, depth, move_generator="objects", processes=1):
+    """
+    Counts leaf-nodes for each root-move
+    :param fen: fen-string to count from
+    :param depth: How many moves to look ahead (at least 1)
+    :param move_generator: "objects" or "bitboard"
+    :param processes: Number of processes to split the root-moves across
+    :return: list of [move, number of leaf-nodes]
+    """
+    moves = Position(fen, move_generator).generate_legal_moves()
+    jobs = [[fen, move, depth, move_generator] for move in moves]
+    if processes > 1:
+        with Pool(processes) as pool:
+            counts = pool.map(perft_after_move, jobs)
+    else:
+        counts = [perft_after_move(job) for job in jobs]
+    return [[moves[i], counts[i]] for i in range(len(moves))]
+
+
+def run_suite(max_depth, move_generator="objects", processes=1):
+    """
+    Runs perft on all reference positions and prints nodes, correctness and speed
+    :param max_depth: Deepest depth to count to
+    :param move_generator: "objects" or "bitboard"
+    :param processes: Number of processes to split the root-moves across
+    :return: True if all counts are correct
+    """
+    all_correct = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        print(name)
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            tic = time.time()
+            nodes = sum(count for _, count in divide(fen, depth, move_generator, processes))
+            toc = time.time() - tic
+            correct = nodes == expected[depth - 1]
+            all_correct = all_correct and correct
+            total_nodes += nodes
+            total_time += toc
+            print("  Depth {}: {:>10} nodes {:>4} {:>8.2f} s {:>10.0f} nodes/s".format(
+                depth, nodes, "OK" if correct else "FAIL (expected {})".format(expected[depth - 1]),
+                toc, nodes / max(toc, 1e-9)
+            ))
+    print("Total: {} nodes in {:.2f} s, {:.0f} nodes/s".format(total_nodes, total_time, total_nodes / max(total_time, 1e-9)))
+    print("All counts correct" if all_correct else "Some counts are WRONG")
+    return all_correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts leaf-nodes of the move-tree to test the move generator")
+    parser.add_argument("--depth", type=int, default=3, help="Depth to count to")
+    parser.add_argument("--generator", default="objects", choices=["objects", "bitboard"], help="Move generator")
+    parser.add_argument("--processes", type=int, default=1, help="Processes to split the root-moves across")
+    parser.add_argument("--divide", metavar="FEN", help="Show count for each root-move from this fen")
+    args = parser.parse_args()
+
+    if args.divide is not None:
+        tic = time.time()
+        total = 0
+        for move, count in divide(args.divide, args.depth, args.generator, args.processes):
+            print("{}: {}".format(move_to_string(move), count))
+            total += count
+        toc = time.time() - tic
+        print("\nNodes: {}\nTime: {:.2f} s\nNodes/s: {:.0f}".format(total, toc, total / max(toc, 1e-9)))
+    else:
+        run_suite(args.depth, args.generator, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,750 @@
+import numpy as np
+import board.chess_logic as logic
+import board.bitboard as bitboard
+import board.zobrist as zobrist
+import util.util as util
+
+# Move generators that can be used by a position
+MOVE_GENERATORS = {"objects": logic, "bitboard": bitboard}
+
+
+class Position:
+    """
+    Chess-position with rules, fen and moves. Has no display, so it can be used headless
+    """
+    def __init__(
+            self,
+            fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0",
+            move_generator="objects"
+    ):
+        """
+        Initializes position
+        :param fen: fen-string
+        :param move_generator: "objects" to generate moves from squares and pieces (chess_logic)
+                               or "bitboard" to generate moves from bitboards
+        """
+        # Init data
+        self.move_generator = None
+        self.move_generator_name = ""
+        self.set_move_generator(move_generator)
+        self.fen = fen
+        self.fen_pos = ""
+        self.bw = ""
+        self.castle = ""
+        self.en_passent = ""
+        self.half_move = 0
+        self.full_move = 0
+        self.board_array = None
+        self.key = 0
+        # Bitboard for each piece-type, bit row * 8 + col is set if the piece is on the square.
+        # Kept up to date by put_piece, set_piece_type and unmake_move like the zobrist-key
+        self.bitboards = {}
+        self.set_fen(self.fen)
+        self.board_array = self.set_board_array()
+        self.add_pieces()
+        self.status = "-"
+        # Number of times each position (zobrist-key) has been seen in the game and the moves made on top of it
+        self.positions_in_game = {self.key: 1}
+        self.promoting = False
+        self.undo_stack = []
+
+    def __str__(self):
+        ret_string = ""
+        for row in self.board_array:
+            for col in row:
+                ret_string += col.__str__() + " "
+            ret_string += "\n"
+        return ret_string
+
+    def set_move_generator(self, move_generator):
+        """
+        Selects move generator
+        :param move_generator: "objects" or "bitboard"
+        :return:
+        """
+        if move_generator not in MOVE_GENERATORS:
+            raise ValueError("Move generator can only be \"objects\" or \"bitboard\", you tried " + move_generator)
+        self.move_generator = MOVE_GENERATORS[move_generator]
+        self.move_generator_name = move_generator
+
+    def get_move_generator(self):
+        """
+        Gets name of the selected move generator
+        :return: "objects" or "bitboard"
+        """
+        return self.move_generator_name
+
+    def generate_legal_moves(self):
+        """
+        Gets every legal move for the player to move, with the selected move generator
+        :return: list of [from, to, promote] with from and to as [row, col], promote is None if not promoting
+        """
+        return self.move_generator.generate_legal_moves(self)
+
+    def in_check(self):
+        """
+        Checks if the player to move is in check, with the selected move generator
+        :return: True if check
+        """
+        return self.move_generator.in_check(self)
+
+    def set_status(self, status):
+        """
+        Sets status of game. Default is "-"
+        :param status: "w" if white wins, "b" if black wins, "d" if draw
+        :return:
+        """
+        if status in ["w", "b", "d", "-"]:
+            self.status = status
+        else:
+            raise ValueError("Status of game can only be \"w\", \"b\" or \"d\", you tried to set status "+status)
+
+    def get_status(self):
+        """
+        Gets status of game
+        :return: "-" if game continues, "w" if white has won, "b" if black has won, "d" if draw
+        """
+        return self.status
+
+    def get_full_move(self):
+        """
+        Gets full-move
+        :return: self.full_move
+        """
+        return self.full_move
+
+    def set_fen(self, fen):
+        """
+        Set new fen
+        :param fen: fen-string
+        :return:
+        """
+        self.fen = fen
+        fen_list = self.fen.split(" ")
+        self.fen_pos = fen_list[0]
+        self.bw = fen_list[1]
+        self.castle = fen_list[2]
+        self.en_passent = fen_list[3]
+        try:
+            self.half_move = int(fen_list[4])
+            self.full_move = int(fen_list[5])
+        except ValueError as e:
+            print(e)
+        if self.board_array is not None:
+            self.key = zobrist.position_key(self)
+            self.bitboards = self.make_bitboards()
+
+    def get_fen(self):
+        """
+        Returns fen as string. Made from the board if a move has been made with make_move
+        :return: fen
+        """
+        if self.fen is None:
+            self.fen = " ".join([
+                self.get_fen_pos(), self.bw, self.castle, self.en_passent, str(self.half_move), str(self.full_move)
+            ])
+        return self.fen
+
+    def get_fen_pos(self):
+        """
+        Returns piece-placement part of fen. Made from the board if a move has been made with make_move
+        :return: fen_string
+        """
+        if self.fen_pos is None:
+            self.fen_pos = self.get_placement()
+        return self.fen_pos
+
+    def get_key(self):
+        """
+        Returns zobrist-key of the position. Is the same for the same pieces, player to move, castling-rights
+        and en-passant square, so it can be used as key for caches and tables
+        :return: 64-bit key (int)
+        """
+        return self.key
+
+    def get_placement(self):
+        """
+        Makes the piece-placement part of the fen based on board
+        :return: String with piece-placement
+        """
+        new_fen = ""
+        row_num = 0
+        for row in self.board_array:
+            empty = 0
+            for sq in row:
+                if sq.get_content() is None:
+                    empty += 1
+                else:
+                    if empty > 0:
+                        new_fen += str(empty)
+                    new_fen += sq.get_content().get_type()
+                    empty = 0
+            if empty > 0:
+                new_fen += str(empty)
+            if row_num < 7:
+                new_fen += "/"
+            row_num += 1
+        return new_fen
+
+    def new_fen(self):
+        """
+        Make new fen based on board, with the other player to move
+        :return:
+        """
+        new_fen = self.get_placement()
+        new_fen += " "
+        if self.get_bw() == "w":
+            new_fen += "b"
+        elif self.get_bw() == "b":
+            new_fen += "w"
+        new_fen += " "
+        new_fen += self.castle
+        new_fen += " "
+        new_fen += self.en_passent
+        new_fen += " "
+        new_fen += str(self.half_move)
+        new_fen += " "
+        new_fen += str(self.full_move)
+        self.fen = new_fen
+
+    def get_bw(self):
+        """
+        Returns if it is black or white to move
+        :return: "b" if it is black to move, "w" if it is white to move
+        """
+        return self.bw
+
+    def get_castle(self):
+        """
+        Returns castle-string
+        :return: String of castling-opportunities
+        """
+        return self.castle
+
+    def remove_from_castle(self, c):
+        """
+        Remove castling-rights
+        :param c: What to remove (K, Q, k or q)
+        :return:
+        """
+        new_castle = ""
+        for cas in self.castle:
+            if cas != c:
+                new_castle += cas
+        if new_castle == "":
+            new_castle = "-"
+        self.key ^= zobrist.castle_key(self.castle) ^ zobrist.castle_key(new_castle)
+        self.castle = new_castle
+
+    def get_en_passent(self):
+        """
+        Returns en-passent
+        :return: String with en-passent info
+        """
+        return self.en_passent
+
+    def get_promoting(self):
+        """
+        Returns if pawn can promote or not
+        :return: boolean. True if pawn can promote
+        """
+        return self.promoting
+
+    def set_board_array(self):
+        """
+        Sets board-array
+        :return: board-array
+        """
+        board_array = np.array(
+            [np.array(
+                [self.Square(row, col) for row in range(8)]
+            ) for col in range(8)]
+        )
+        # Set board-array in each square
+        for x in board_array:
+            for sqr in x:
+                sqr.set_board_array(self)
+        return board_array
+
+    def get_board_array(self):
+        """
+        Gets board_array
+        :return: board_array
+        """
+        return self.board_array
+
+    def add_pieces(self):
+        """
+        Adds pieces to board-array
+        :return:
+        """
+        i = 0
+        j = 0
+        for c in self.get_fen_pos():
+            try:
+                a = int(c)
+                j += a
+            except ValueError:
+                if c == "/":
+                    i += 1
+                    j = 0
+                else:
+                    self.board_array[i, j].add_content(self.Piece(c))
+                    j += 1
+        self.key = zobrist.position_key(self)
+        self.bitboards = self.make_bitboards()
+
+    def make_bitboards(self):
+        """
+        Makes bitboards from the pieces on the board
+        :return: dict with a bitboard for each piece-type
+        """
+        bitboards = {t: 0 for t in "PNBRQKpnbrqk"}
+        for row in range(8):
+            for col in range(8):
+                content = self.board_array[row, col].get_content()
+                if content is not None:
+                    bitboards[content.get_type()] |= 1 << (row * 8 + col)
+        return bitboards
+
+    def get_bitboards(self):
+        """
+        Gets bitboards of the pieces
+        :return: dict with a bitboard for each piece-type. Is changed by the next move, copy it to keep it
+        """
+        return self.bitboards
+
+    def put_piece(self, row, col, piece=None):
+        """
+        Puts piece on square and updates zobrist-key and bitboards
+        :param row: Row of square
+        :param col: Column of square
+        :param piece: piece-class, None to empty the square
+        :return:
+        """
+        square = self.board_array[row, col]
+        bit = 1 << (row * 8 + col)
+        if square.get_content() is not None:
+            self.key ^= zobrist.piece_key(square.get_content().get_type(), row, col)
+            self.bitboards[square.get_content().get_type()] ^= bit
+        if piece is not None:
+            self.key ^= zobrist.piece_key(piece.get_type(), row, col)
+            self.bitboards[piece.get_type()] ^= bit
+        square.add_content(piece)
+
+    def set_piece_type(self, row, col, t):
+        """
+        Changes type of piece on square (promotion) and updates zobrist-key and bitboards
+        :param row: Row of square
+        :param col: Column of square
+        :param t: New type
+        :return:
+        """
+        piece = self.board_array[row, col].get_content()
+        bit = 1 << (row * 8 + col)
+        self.key ^= zobrist.piece_key(piece.get_type(), row, col)
+        self.bitboards[piece.get_type()] ^= bit
+        piece.set_type(t)
+        self.key ^= zobrist.piece_key(piece.get_type(), row, col)
+        self.bitboards[piece.get_type()] ^= bit
+
+    def move_piece(self, fr, to, human=False):
+        """
+        Moves piece on board
+        :param fr: Square to move from
+        :param to: Square to move to
+        :param human: If player to move are human or not
+        :return:
+        """
+        # Update half-move clock and full-move clock
+        self.half_move += 1
+        if self.get_bw() == "b":
+            self.full_move += 1
+        if self.board_array[fr[0], fr[1]].get_content().get_type().lower() == "p":
+            self.half_move = 0
+        if self.board_array[to[0], to[1]].get_content() is not None:
+            self.half_move = 0
+
+        # Move piece
+        self.put_piece(to[0], to[1], self.board_array[fr[0], fr[1]].get_content())
+        self.put_piece(fr[0], fr[1])
+
+        # If taking on en-passant
+        if self.get_en_passent() != "-" and self.board_array[to[0], to[1]].get_content().get_type().lower() == "p":
+            if util.array_position_to_string_position(to) == self.get_en_passent():
+                if to[0] == 2:
+                    self.put_piece(3, to[1])
+                elif to[0] == 5:
+                    self.put_piece(4, to[1])
+                self.half_move = 0
+
+        # If castling
+        to_content = self.board_array[to[0], to[1]].get_content()
+        if "K" in self.castle:
+            if to_content is not None:
+                if to_content.get_type() == "K" and to[1] - 2 == fr[1]:
+                    self.put_piece(7, 5, self.board_array[7, 7].get_content())
+                    self.put_piece(7, 7)
+                    self.remove_from_castle("K")
+        if "Q" in self.castle:
+            if to_content is not None:
+                if to_content.get_type() == "K" and to[1] + 2 == fr[1]:
+                    self.put_piece(7, 3, self.board_array[7, 0].get_content())
+                    self.put_piece(7, 0)
+                    self.remove_from_castle("Q")
+        if "k" in self.castle:
+            if to_content is not None:
+                if to_content.get_type() == "k" and to[1] - 2 == fr[1]:
+                    self.put_piece(0, 5, self.board_array[0, 7].get_content())
+                    self.put_piece(0, 7)
+                    self.remove_from_castle("k")
+        if "q" in self.castle:
+            if to_content is not None:
+                if to_content.get_type() == "k" and to[1] + 2 == fr[1]:
+                    self.put_piece(0, 3, self.board_array[0, 0].get_content())
+                    self.put_piece(0, 0)
+                    self.remove_from_castle("q")
+
+        # If rook is taken on start-pos, remove castle-right
+        if to == [7, 0]:
+            self.remove_from_castle("Q")
+        if to == [7, 7]:
+            self.remove_from_castle("K")
+        if to == [0, 0]:
+            self.remove_from_castle("q")
+        if to == [0, 7]:
+            self.remove_from_castle("k")
+
+        # If king or rook moves from start-pos, remove castle-right
+        if to_content is not None:
+            if to_content.get_type() == "K" and fr == [7, 4]:
+                self.remove_from_castle("K")
+                self.remove_from_castle("Q")
+            if to_content.get_type() == "k" and fr == [0, 4]:
+                self.remove_from_castle("k")
+                self.remove_from_castle("q")
+            if to_content.get_type() == "R":
+                if fr == [7, 0]:
+                    self.remove_from_castle("Q")
+                if fr == [7, 7]:
+                    self.remove_from_castle("K")
+            if to_content.get_type() == "r":
+                if fr == [0, 0]:
+                    self.remove_from_castle("q")
+                if fr == [0, 7]:
+                    self.remove_from_castle("k")
+
+        # Update en-passant
+        self.key ^= zobrist.en_passant_key(self.en_passent)
+        self.en_passent = "-"
+        if to_content is not None:
+            if to_content.get_type() == "P" and to[0] + 2 == fr[0]:
+                self.en_passent = util.array_position_to_string_position([fr[0] - 1, fr[1]])
+            if to_content.get_type() == "p" and to[0] - 2 == fr[0]:
+                self.en_passent = util.array_position_to_string_position([fr[0] + 1, fr[1]])
+        self.key ^= zobrist.en_passant_key(self.en_passent)
+
+        # Promote pawn?
+        self.promoting = False
+        if to[0] == 0 and self.board_array[to[0], to[1]].get_content().get_type() == "P":
+            self.promoting = True
+            if human:
+                self.promote_pawn(to)
+        if to[0] == 7 and self.board_array[to[0], to[1]].get_content().get_type() == "p":
+            self.promoting = True
+            if human:
+                self.promote_pawn(to)
+
+    def make_move(self, move):
+        """
+        Makes a move and gives the turn to the other player. Everything needed to take the move back
+        is pushed on the undo-stack, so unmake_move() can restore the position without rebuilding it.
+        Status of game is not updated, call win_lose_draw() for that
+        :param move: [from, to] or [from, to, promote], where promote is the piece a pawn promotes to
+                     ("q", "r", "b" or "n"). Pawns promote to queen if promote is missing or None
+        :return:
+        """
+        fr = move[0]
+        to = move[1]
+        promote = move[2] if len(move) > 2 and move[2] is not None else "q"
+        piece = self.board_array[fr[0], fr[1]].get_content()
+        piece_type = piece.get_type()
+        captured_square = to
+        captured = self.board_array[to[0], to[1]].get_content()
+        if captured is None and piece_type.lower() == "p" and fr[1] != to[1]:
+            # Taking en-passant
+            captured_square = [fr[0], to[1]]
+            captured = self.board_array[fr[0], to[1]].get_content()
+
+        self.undo_stack.append((
+            fr, to, piece, piece_type, captured, captured_square, self.castle, self.en_passent,
+            self.half_move, self.full_move, self.status, self.promoting, self.fen, self.fen_pos, self.key
+        ))
+
+        self.move_piece(fr, to)
+        if self.promoting:
+            self.set_piece_type(to[0], to[1], promote.upper() if piece_type.isupper() else promote.lower())
+        self.bw = "b" if self.bw == "w" else "w"
+        self.key ^= zobrist.BLACK_TO_MOVE
+
+        # Fen is made when asked for
+        self.fen = None
+        self.fen_pos = None
+        self.positions_in_game[self.key] = self.positions_in_game.get(self.key, 0) + 1
+
+    def unmake_move(self):
+        """
+        Takes back the last move made with make_move
+        :return:
+        """
+        (
+            fr, to, piece, piece_type, captured, captured_square, self.castle, self.en_passent,
+            self.half_move, self.full_move, self.status, self.promoting, fen, fen_pos, key
+        ) = self.undo_stack.pop()
+        self.positions_in_game[self.key] -= 1
+        self.fen = fen
+        self.fen_pos = fen_pos
+        self.key = key
+        self.bw = "b" if self.bw == "w" else "w"
+
+        # Move piece back and put back captured piece. The key is restored above, so only the bitboards are updated
+        self.bitboards[piece.get_type()] ^= 1 << (to[0] * 8 + to[1])
+        self.bitboards[piece_type] ^= 1 << (fr[0] * 8 + fr[1])
+        piece.set_type(piece_type)
+        self.board_array[to[0], to[1]].add_content()
+        self.board_array[fr[0], fr[1]].add_content(piece)
+        if captured is not None:
+            self.board_array[captured_square[0], captured_square[1]].add_content(captured)
+            self.bitboards[captured.get_type()] ^= 1 << (captured_square[0] * 8 + captured_square[1])
+
+        # Move rook back if castling
+        if piece_type.lower() == "k" and abs(to[1] - fr[1]) == 2:
+            rook_from = 7 if to[1] > fr[1] else 0
+            rook_to = 5 if to[1] > fr[1] else 3
+            rook = self.board_array[fr[0], rook_to].get_content()
+            self.board_array[fr[0], rook_from].add_content(rook)
+            self.board_array[fr[0], rook_to].add_content()
+            self.bitboards[rook.get_type()] ^= (1 << (fr[0] * 8 + rook_from)) | (1 << (fr[0] * 8 + rook_to))
+
+    def last_move_changes(self):
+        """
+        Gets the pieces put on and taken off squares by the last move made with make_move
+        :return: list of [type, row, col] for added pieces, list of [type, row, col] for removed pieces
+        """
+        fr, to, piece, piece_type, captured, captured_square = self.undo_stack[-1][:6]
+        added = [[piece.get_type(), to[0], to[1]]]
+        removed = [[piece_type, fr[0], fr[1]]]
+        if captured is not None:
+            removed.append([captured.get_type(), captured_square[0], captured_square[1]])
+        if piece_type.lower() == "k" and abs(to[1] - fr[1]) == 2:
+            rook = "R" if piece_type.isupper() else "r"
+            added.append([rook, fr[0], 5 if to[1] > fr[1] else 3])
+            removed.append([rook, fr[0], 7 if to[1] > fr[1] else 0])
+        return added, removed
+
+    def next_turn(self, visual=False):
+        """
+        Setting up next turn
+        :param visual: Update display after the turn. Only used by boards that have a display
+        :return:
+        """
+        # move_piece() has updated the pieces, castling, en-passant, the clocks and the key,
+        # so only the player to move is left, like in make_move()
+        self.bw = "b" if self.bw == "w" else "w"
+        self.key ^= zobrist.BLACK_TO_MOVE
+        # Fen is made when asked for
+        self.fen = None
+        self.fen_pos = None
+        self.positions_in_game[self.key] = self.positions_in_game.get(self.key, 0) + 1
+
+        # Check for win, lose or draw
+        self.win_lose_draw()
+        if self.status == "w":
+            print("White has won")
+        elif self.status == "b":
+            print("Black has won")
+        elif self.status == "d":
+            print("Draw")
+
+    def win_lose_draw(self):
+        """
+        Checks for win, lose or draw and updates status
+        :return:
+        """
+        white_king_present = False
+        black_king_present = False
+        other_piece_than_king = False
+        check = self.in_check()
+        legal_moves = len(self.generate_legal_moves()) > 0
+
+        # Go through board to check for kings
+        for row in self.get_board_array():
+            for sqr in row:
+                if sqr.get_content() is not None:
+                    if sqr.get_content().get_type() == "K":
+                        white_king_present = True
+                    elif sqr.get_content().get_type() == "k":
+                        black_king_present = True
+                    else:
+                        other_piece_than_king = True
+
+        # Sets status
+        self.set_status("-")
+        if not white_king_present:
+            self.set_status("b")  # Black has won
+        if not black_king_present:
+            self.set_status("w")  # White has won
+        if not other_piece_than_king:
+            self.set_status("d")  # Draw if only kings left
+        if not legal_moves and not check:
+            self.set_status("d")  # Draw
+        if not legal_moves and check:
+            if self.get_bw() == "w":
+                self.set_status("b")  # White is check-mate, black has won
+            elif self.get_bw() == "b":
+                self.set_status("w")  # Black is check-mate, white has won
+        if self.half_move == 100:
+            self.set_status("d")
+        if self.positions_in_game.get(self.key, 0) >= 3:
+            self.set_status("d")
+
+    def promote_pawn(self, to, t=""):
+        """
+        Promotes pawn
+        :param to: Square that the pawn has moved to
+        :param t: Which type, default is empty string, which means that a human should choose
+        :return:
+        """
+        new_type = t
+        loop = True
+        while loop:
+            if new_type == "":
+                new_type = input(
+                    """
+Promote pawn:
+What will you promote your pawn to?
+q: Queen
+r: Rook
+n: Knight
+b: Bishop
+"""
+                )
+            if new_type in ["q", "r", "n", "b"]:
+                print("Promoting pawn to "+new_type)
+                if to[0] == 0:
+                    self.set_piece_type(to[0], to[1], new_type.upper())
+                if to[0] == 7:
+                    self.set_piece_type(to[0], to[1], new_type.lower())
+                loop = False
+            else:
+                print("Invalid new type. Try again!\n\n")
+                new_type = ""
+
+    class Square:
+        """
+        Square in chess-board
+        """
+        def __init__(self, row, col):
+            self.content = None
+            self.board = None
+            self.row = row
+            self.col = col
+            self.name = self.set_name()
+
+        def __str__(self):
+            if self.content is None:
+                return "-"
+            return self.content.__str__()
+
+        def set_name(self):
+            """
+            Sets Name of square. eg. e4
+            :return:
+            """
+            char_dict = {
+                0: "a",
+                1: "b",
+                2: "c",
+                3: "d",
+                4: "e",
+                5: "f",
+                6: "g",
+                7: "h"
+            }
+            return char_dict[self.col] + str(8 - self.row)
+
+        def get_name(self):
+            """
+            Returns name of square. eg. e4
+            :return: Name of square as String
+            """
+            return self.name
+
+        def set_board_array(self, b):
+            """
+            Sets pointer to board
+            :param b: board-object
+            :return:
+            """
+            self.board = b
+
+        def get_board(self):
+            """
+            Returns board
+            :return: board
+            """
+            return self.board
+
+        def add_content(self, piece=None):
+            """
+            Adds piece to square
+            :param piece: piece-class, None is default
+            :return:
+            """
+            self.content = piece
+
+        def get_content(self):
+            """
+            Returns content
+            :return: content of square
+            """
+            return self.content
+
+        def get_position(self):
+            """
+            Returns position
+            :return: [row, col]
+            """
+            return [self.col, self.row]
+
+    class Piece:
+        """
+        Piece on chess-board
+        """
+        def __init__(self, t):
+            """
+            Initializes piece
+            :param t: Which type
+            """
+            self.type = t
+
+        def __str__(self):
+            return self.type
+
+        def set_type(self, t):
+            """
+            Sets new type of piece
+            :param t: type to be set
+            :return:
+            """
+            if t.lower() in ["q", "r", "n", "b", "p", "k"]:
+                self.type = t
+            else:
+                raise ValueError("Couldn't set new type for piece")
+
+        def get_type(self):
+            """
+            Returns type
+            :return: type of piece
+            """
+            return self.type
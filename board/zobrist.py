@@ -0,0 +1,77 @@
+import random
+import util.util as util
+
+# Fixed seed, so the same position gets the same key in every process and every run
+_random = random.Random(20240601)
+
+
+def random_key():
+    """
+    Makes a random 64-bit number
+    :return: int
+    """
+    return _random.getrandbits(64)
+
+
+# One number for each piece-type on each square, indexed by [type][row * 8 + col]
+PIECES = {t: [random_key() for _ in range(64)] for t in "PNBRQKpnbrqk"}
+BLACK_TO_MOVE = random_key()
+CASTLING = {c: random_key() for c in "KQkq"}
+# One number for each column an en-passant square can be in
+EN_PASSANT = [random_key() for _ in range(8)]
+
+
+def piece_key(t, row, col):
+    """
+    Gets number for a piece on a square
+    :param t: Type of piece
+    :param row: Row of square
+    :param col: Column of square
+    :return: int
+    """
+    return PIECES[t][row * 8 + col]
+
+
+def castle_key(castle):
+    """
+    Gets number for castling-rights
+    :param castle: Castle-string from fen, e.g. "KQkq" or "-"
+    :return: int
+    """
+    key = 0
+    for c in castle:
+        if c in CASTLING:
+            key ^= CASTLING[c]
+    return key
+
+
+def en_passant_key(en_passant):
+    """
+    Gets number for en-passant square
+    :param en_passant: En-passant square from fen, e.g. "e3" or "-"
+    :return: int
+    """
+    if en_passant == "-" or en_passant == "":
+        return 0
+    return EN_PASSANT[util.string_position_to_array_position(en_passant)[1]]
+
+
+def position_key(position):
+    """
+    Computes the key of a position from scratch. Position keeps its key up to date when moves are made,
+    so this is only needed when a position is set up
+    :param position: Position (or Board)
+    :return: 64-bit key
+    """
+    key = 0
+    board_array = position.get_board_array()
+    for row in range(8):
+        for col in range(8):
+            content = board_array[row, col].get_content()
+            if content is not None:
+                key ^= piece_key(content.get_type(), row, col)
+    if position.get_bw() == "b":
+        key ^= BLACK_TO_MOVE
+    key ^= castle_key(position.get_castle())
+    key ^= en_passant_key(position.get_en_passent())
+    return key
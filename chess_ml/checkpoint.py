@@ -0,0 +1,80 @@
+import threading
+import util.util as util
+
+
+class CheckpointWriter:
+    """
+    Saves the weights of perceptrons in a background thread. Each interval the weights that changed since
+    they were last saved are written, so many changes become one write and nothing is written when the
+    weights are the same. util.save_weights writes a temporary file and renames it, so a crash while
+    saving leaves the old file as it was
+    """
+    def __init__(self, interval=30.0):
+        """
+        Starts the writer-thread
+        :param interval: Seconds between checks for changed weights
+        """
+        self.interval = interval
+        # [perceptron, file, version of the weights in the file]
+        self.files = []
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def watch(self, p_tron, file):
+        """
+        Saves the weights of a perceptron to a file when they change. The weights it has now count as saved
+        :param p_tron: Perceptron
+        :param file: .npy-file to save to
+        :return:
+        """
+        with self.lock:
+            self.files = [f for f in self.files if f[1] != file]
+            self.files.append([p_tron, file, p_tron.get_version()])
+
+    def run(self):
+        """
+        Writes changed weights every interval until close() is called
+        :return:
+        """
+        while not self.stopping.wait(self.interval):
+            self.write_changed()
+
+    def write_changed(self):
+        """
+        Writes the weights that changed since they were last saved
+        :return: number of files written
+        """
+        written = 0
+        with self.lock:
+            for f in self.files:
+                p_tron, file, saved_version = f
+                # Read the version before the weights. If they change in between, they are written next time
+                version = p_tron.get_version()
+                if version == saved_version:
+                    continue
+                util.save_weights(p_tron.weights, file)
+                f[2] = version
+                written += 1
+            self.writes += written
+        if written > 0:
+            print("Saved weights to {} file(s)".format(written))
+        return written
+
+    def get_writes(self):
+        """
+        Gets number of files written since start
+        :return: int
+        """
+        return self.writes
+
+    def close(self):
+        """
+        Stops the writer-thread and writes the weights that changed since the last write
+        :return:
+        """
+        self.stopping.set()
+        self.thread.join()
+        self.write_changed()
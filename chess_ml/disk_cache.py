@@ -0,0 +1,159 @@
+import os
+import numpy as np
+from chess_ml.transposition import encode_move, decode_move, NO_MOVE
+
+# One record per position. Evaluation and search-result are only valid for the weights they were made with
+RECORD = np.dtype([
+    ("key", np.uint64),
+    ("weights_id", np.uint32),
+    ("evaluation", np.float32),
+    ("score", np.float32),
+    ("move", np.int16),
+    ("depth", np.int8),
+    ("has_evaluation", np.int8),
+])
+
+
+class DiskCache:
+    """
+    Table of evaluations and search-results stored in a memory-mapped .npy-file, so it survives restarts and
+    can be read by many processes at once. Keyed by zobrist-key, one record for each key % size.
+    Records made with other weights are not used, except the best move, which is still good for move ordering
+    """
+    def __init__(self, file="data/search_cache.npy", size=1 << 20, read_only=False):
+        """
+        Opens the table, and makes it if the file doesn't exist
+        :param file: Path of the file
+        :param size: Records in a new file. An existing file keeps its size
+        :param read_only: Open without writing, e.g. in worker-processes. put-methods do nothing
+        """
+        self.file = file
+        self.read_only = read_only
+        self.records = None
+        if os.path.exists(file):
+            records = np.load(file, mmap_mode="r" if read_only else "r+")
+            if records.dtype == RECORD and records.ndim == 1:
+                self.records = records
+            elif not read_only:
+                print("Making new search-cache, {} has another format".format(file))
+        if self.records is None and not read_only:
+            self.records = np.lib.format.open_memmap(file, mode="w+", dtype=RECORD, shape=(size,))
+        self.hits = 0
+        self.misses = 0
+
+    def is_open(self):
+        """
+        Checks if the table could be opened
+        :return: True if open
+        """
+        return self.records is not None
+
+    def flush(self):
+        """
+        Writes changes to disk
+        :return:
+        """
+        if self.records is not None and not self.read_only:
+            self.records.flush()
+
+    def find(self, key):
+        """
+        Finds the record of a position
+        :param key: zobrist-key
+        :return: record, None if not stored
+        """
+        if self.records is None:
+            return None
+        record = self.records[key % len(self.records)]
+        if record["key"] != key:
+            return None
+        return record
+
+    def get_evaluation(self, key, weights_id):
+        """
+        Gets the perceptron-prediction of a position
+        :param key: zobrist-key
+        :param weights_id: Perceptron.get_weights_id() of the weights in use
+        :return: chance of white winning, None if not stored for these weights
+        """
+        record = self.find(key)
+        if record is None or record["weights_id"] != weights_id or not record["has_evaluation"]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return float(record["evaluation"])
+
+    def get_search(self, key, weights_id):
+        """
+        Gets the result of an earlier search of a position
+        :param key: zobrist-key
+        :param weights_id: Perceptron.get_weights_id() of the weights in use
+        :return: depth, score for the player to move, best move. Depth and score are None if the result was
+                 made with other weights. None if there is no result
+        """
+        record = self.find(key)
+        if record is None or record["move"] == NO_MOVE:
+            return None
+        if record["weights_id"] != weights_id:
+            return None, None, decode_move(record["move"])
+        return int(record["depth"]), float(record["score"]), decode_move(record["move"])
+
+    def record_for(self, key, weights_id):
+        """
+        Gets the record to write a position to. Starts a new record if it holds another position or other weights
+        :param key: zobrist-key
+        :param weights_id: Perceptron.get_weights_id() of the weights in use
+        :return: index of record
+        """
+        i = key % len(self.records)
+        if self.records["key"][i] != key or self.records["weights_id"][i] != weights_id:
+            keep_move = self.records["key"][i] == key
+            self.records[i] = (key, weights_id, 0.0, 0.0, self.records["move"][i] if keep_move else NO_MOVE, -1, 0)
+        return i
+
+    def put_evaluation(self, key, weights_id, evaluation):
+        """
+        Stores the perceptron-prediction of a position
+        :param key: zobrist-key
+        :param weights_id: Perceptron.get_weights_id() of the weights in use
+        :param evaluation: chance of white winning
+        :return:
+        """
+        if self.records is None or self.read_only:
+            return
+        i = self.record_for(key, weights_id)
+        self.records["evaluation"][i] = evaluation
+        self.records["has_evaluation"][i] = 1
+
+    def put_search(self, key, weights_id, depth, score, move):
+        """
+        Stores the result of a search, if it is deeper than the one stored for the weights
+        :param key: zobrist-key
+        :param weights_id: Perceptron.get_weights_id() of the weights in use
+        :param depth: Depth searched
+        :param score: Score for the player to move
+        :param move: Best move [from, to, promote]
+        :return:
+        """
+        if self.records is None or self.read_only:
+            return
+        i = self.record_for(key, weights_id)
+        if depth >= self.records["depth"][i]:
+            self.records["depth"][i] = min(depth, 127)
+            self.records["score"][i] = score
+            self.records["move"][i] = encode_move(move)
+
+    def get_hit_rate(self):
+        """
+        Gets share of evaluation-lookups that found a prediction
+        :return: float between 0 and 1
+        """
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def reset_counters(self):
+        """
+        Sets hits and misses to 0
+        :return:
+        """
+        self.hits = 0
+        self.misses = 0
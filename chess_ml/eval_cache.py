@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+
+class EvalCache:
+    """
+    Cache of perceptron-predictions keyed by zobrist-key, which throws out the least recently used
+    prediction when it is full. Is cleared when the weights of the perceptron change
+    """
+    def __init__(self, p_tron, size=1 << 16):
+        """
+        Initializes cache
+        :param p_tron: Perceptron whose predictions are cached
+        :param size: Most predictions to keep
+        """
+        if size < 1:
+            raise ValueError("Size of evaluation cache must be at least 1, you tried " + str(size))
+        self.perceptron = p_tron
+        self.size = size
+        self.entries = OrderedDict()
+        self.version = p_tron.get_version()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_perceptron(self, p_tron):
+        """
+        Caches predictions of another perceptron, e.g. a snapshot. Is cleared if its weights are another version
+        :param p_tron: Perceptron
+        :return:
+        """
+        self.perceptron = p_tron
+        if self.version != p_tron.get_version():
+            self.clear()
+
+    def clear(self):
+        """
+        Removes every prediction
+        :return:
+        """
+        self.entries.clear()
+        self.version = self.perceptron.get_version()
+
+    def get(self, key):
+        """
+        Gets a cached prediction
+        :param key: zobrist-key of position
+        :return: chance of white winning, None if not cached
+        """
+        if self.version != self.perceptron.get_version():
+            self.clear()
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Caches a prediction
+        :param key: zobrist-key of position
+        :param value: chance of white winning
+        :return:
+        """
+        if self.version != self.perceptron.get_version():
+            self.clear()
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def get_hits(self):
+        """
+        Gets number of lookups that found a prediction
+        :return: int
+        """
+        return self.hits
+
+    def get_misses(self):
+        """
+        Gets number of lookups that didn't find a prediction
+        :return: int
+        """
+        return self.misses
+
+    def get_hit_rate(self):
+        """
+        Gets share of lookups that found a prediction
+        :return: float between 0 and 1
+        """
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def reset_counters(self):
+        """
+        Sets hits and misses to 0
+        :return:
+        """
+        self.hits = 0
+        self.misses = 0
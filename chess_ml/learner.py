@@ -0,0 +1,84 @@
+import queue
+import threading
+import util.util as util
+
+
+class Learner:
+    """
+    Trains a perceptron in a background thread, so the player doesn't wait for back-propagation.
+    Samples are queued and learned one at a time. back_prop() makes new weight-matrices, which are
+    swapped in with set_weights(), so searches that took a snapshot of the perceptron keep the old weights
+    """
+    def __init__(self, p_tron, eta=0.1, max_samples=1024):
+        """
+        Starts the learner-thread
+        :param p_tron: Perceptron to train. Only the learner should set its weights
+        :param eta: Learning rate
+        :param max_samples: Most samples waiting in the queue. add_sample() waits when it is full
+        """
+        self.perceptron = p_tron
+        self.eta = eta
+        self.samples = queue.Queue(max_samples)
+        self.updates = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add_sample(self, fen, target):
+        """
+        Queues a position to learn from
+        :param fen: fen-string of the position
+        :param target: Chance of white winning in the position, e.g. from a search or the result of the game
+        :return:
+        """
+        self.samples.put((fen, target))
+
+    def run(self):
+        """
+        Learns from samples until close() is called
+        :return:
+        """
+        while True:
+            sample = self.samples.get()
+            try:
+                if sample is None:
+                    break
+                self.learn(sample[0], sample[1])
+            finally:
+                self.samples.task_done()
+
+    def learn(self, fen, target):
+        """
+        Moves the perceptron's prediction for a position towards a target
+        :param fen: fen-string of the position
+        :param target: Chance of white winning
+        :return: True if the weights changed
+        """
+        p, a = self.perceptron.predict(util.get_data(fen))
+        if p - target == 0.0:
+            return False
+        print("Learning: predicted value: {}, target value: {}".format(p, target))
+        self.perceptron.set_weights(self.perceptron.back_prop(a, p, target, self.eta))
+        self.updates += 1
+        return True
+
+    def get_updates(self):
+        """
+        Gets number of times the weights were changed
+        :return: int
+        """
+        return self.updates
+
+    def wait(self):
+        """
+        Waits until every queued sample is learned
+        :return:
+        """
+        self.samples.join()
+
+    def close(self):
+        """
+        Learns the queued samples and stops the learner-thread
+        :return:
+        """
+        self.samples.put(None)
+        self.thread.join()
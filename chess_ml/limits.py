@@ -0,0 +1,123 @@
+import time
+
+# Moves the game is expected to last from here, when the clock has to last the rest of the game
+MIN_MOVES_LEFT = 15
+EXPECTED_GAME_LENGTH = 50
+
+
+class SearchLimits:
+    """
+    How much a search can use. Limits that are None are not used
+    """
+    def __init__(self, max_time=None, max_nodes=None, max_depth=64, clock=None, increment=0.0, moves_to_go=None,
+                 overhead=0.05, quiescence_ply=4):
+        """
+        Initializes search limits
+        :param max_time: Most seconds to use on a move
+        :param max_nodes: Most nodes to search for a move
+        :param max_depth: Deepest depth to search to
+        :param clock: Seconds left on the clock, which has to last the rest of the game
+        :param increment: Seconds added to the clock after each move
+        :param moves_to_go: Moves until the clock gets more time, None if the clock has to last the game
+        :param overhead: Seconds to keep on the clock for everything else than the search
+        :param quiescence_ply: Most captures and promotions to search after max_depth or the depth being searched.
+                               0 evaluates the positions at the depth as they are
+        """
+        if max_depth < 1:
+            raise ValueError("max_depth must be at least 1, you tried " + str(max_depth))
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.clock = clock
+        self.increment = increment
+        self.moves_to_go = moves_to_go
+        self.overhead = overhead
+        self.quiescence_ply = quiescence_ply
+
+    def get_clock(self):
+        """
+        Gets seconds left on the clock
+        :return: float, None if there is no clock
+        """
+        return self.clock
+
+    def update_clock(self, used):
+        """
+        Takes time used on a move from the clock and adds the increment
+        :param used: Seconds used on the move
+        :return:
+        """
+        if self.clock is None:
+            return
+        self.clock = max(self.clock - used, 0.0) + self.increment
+        if self.moves_to_go is not None:
+            self.moves_to_go = max(self.moves_to_go - 1, 1)
+
+
+class TimeManager:
+    """
+    Decides how long a search can take. The search doesn't start a new depth after the soft limit,
+    and stops in the middle of a depth at the hard limit
+    """
+    def __init__(self, limits):
+        """
+        Initializes time manager
+        :param limits: SearchLimits
+        """
+        self.limits = limits
+        self.tic = 0.0
+        self.soft_limit = float("inf")
+        self.hard_limit = float("inf")
+
+    def start(self, full_move=0):
+        """
+        Starts the clock for a search and allocates time to it
+        :param full_move: Full-move number of the position, used to guess how many moves are left
+        :return:
+        """
+        self.tic = time.time()
+        self.soft_limit, self.hard_limit = self.allocate(full_move)
+
+    def allocate(self, full_move=0):
+        """
+        Allocates time for a move from the clock and max_time
+        :param full_move: Full-move number of the position
+        :return: soft limit, hard limit in seconds
+        """
+        soft = float("inf")
+        hard = float("inf")
+        clock = self.limits.clock
+        if clock is not None:
+            if self.limits.moves_to_go is not None:
+                moves_left = self.limits.moves_to_go
+            else:
+                moves_left = max(EXPECTED_GAME_LENGTH - full_move, MIN_MOVES_LEFT)
+            available = max(clock - self.limits.overhead, 0.0)
+            hard = available / 2.0
+            soft = min(available / moves_left + self.limits.increment * 0.75, hard)
+            hard = min(soft * 4.0, hard)
+        if self.limits.max_time is not None:
+            soft = min(soft, self.limits.max_time)
+            hard = min(hard, self.limits.max_time)
+        return soft, hard
+
+    def elapsed(self):
+        """
+        Gets seconds since start()
+        :return: float
+        """
+        return time.time() - self.tic
+
+    def time_up(self):
+        """
+        Checks if the search has to stop now
+        :return: True if hard limit is passed
+        """
+        return self.elapsed() > self.hard_limit
+
+    def start_new_depth(self):
+        """
+        Checks if there is time to search one depth more
+        :return: True if soft limit isn't passed
+        """
+        return self.elapsed() < self.soft_limit
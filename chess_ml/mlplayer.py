@@ -1,45 +1,82 @@
-import copy
-import sys
-
-from chess_ml import perceptron, position_nodes
-from board import chess_logic
-import util.util as util
-from tqdm import tqdm
 import time
-import numpy as np
-
-
-def sort_node_func(e):
-    return e.get_sort_prediction()
-
-
-def finished_game(status):
-    """
-    Checks if game is finished
-    :param status:
-    :return: True if game is finished, false if not
-    """
-    return status in ["w", "b", "d"]
-
-
-def finished_prediction(status):
-    """
-    Gets prediction of finished game
-    :param status:
-    :return: 1.0 if white wins, 0.0 if black wins, 0.5 if draw
-    """
-    finished_dict = {"w": 1.0, "b": 0.0, "d": 0.5}
-    return finished_dict[status]
+import threading
+from board.position import Position
+from board.perft import move_to_string
+from chess_ml import perceptron, search, transposition, ordering, limits, parallel, position_nodes, eval_cache, \
+    disk_cache, learner
+import util.util as util
 
 
 class MlPlayer:
-    def __init__(self, color, board, p_tron=None, promote_p_tron=None):
+    def __init__(self, color, board, p_tron=None, promote_p_tron=None, hash_mb=16, search_limits=None,
+                 workers=1, ponder=False, eval_cache_size=1 << 16, disk_cache_file=None,
+                 checkpoints=None, learner=None):
+        """
+        Initializes player
+        :param color: "w" or "b"
+        :param board: Board to play on
+        :param p_tron: Perceptron for positions. Loaded from data/weights.npy if None
+        :param promote_p_tron: Perceptron for promotions. Loaded from data/promote_weights.npy if None
+        :param hash_mb: Megabytes for the transposition table, which is kept from move to move
+        :param search_limits: SearchLimits for each move. Default is 60 seconds a move.
+                              The clock in it counts down as the player moves
+        :param workers: Processes to search with. More than 1 splits the root-moves across a process-pool
+        :param ponder: Search on the opponent's time, after guessing the opponent's move
+        :param eval_cache_size: Most predictions to keep in the evaluation cache
+        :param disk_cache_file: Path of the search cache that is kept between runs, e.g. data/search_cache.npy.
+                                None to not use it
+        :param checkpoints: CheckpointWriter that saves the weights when they change.
+                            None to not save them
+        :param learner: Learner that trains p_tron in the background. Players sharing p_tron must share it.
+                        The player makes its own if None
+        """
         self.color = color
         self.perceptron = p_tron
         self.promote_perceptron = promote_p_tron
         self.board = board
         self.game_history = []
         self.promote_history = []
+        self.table = transposition.TranspositionTable(hash_mb)
+        self.orderer = ordering.MoveOrderer()
+        self.tree = position_nodes.NodePool()
+        # Position and move of the last search, to find the part of the tree that is still used
+        self.last_fen = None
+        self.last_move = None
+        if search_limits is None:
+            search_limits = limits.SearchLimits(max_time=60.0)
+        self.limits = search_limits
+        self.checkpoints = checkpoints
+        self.learner = learner
+        # Only close the learner if it is this player's own
+        self.own_learner = False
+        self.disk_cache = None
+        if disk_cache_file is not None and color != "h":
+            self.disk_cache = disk_cache.DiskCache(disk_cache_file)
+        self.parallel = None
+        if workers > 1 and color != "h":
+            self.parallel = parallel.ParallelSearch(workers, hash_mb, disk_cache_file)
+        self.ponder = ponder
+        self.eval_cache_size = eval_cache_size
+        self.eval_cache = None
+        self.ponder_search = None
+        self.ponder_thread = None
+        self.ponder_key = None
+
+    def close(self):
+        """
+        Stops pondering and worker-processes, if any
+        :return:
+        """
+        self.stop_pondering()
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        if self.own_learner:
+            self.learner.close()
+            self.learner = None
+            self.own_learner = False
+        if self.disk_cache is not None:
+            self.disk_cache.flush()
 
     def get_color(self):
         """
@@ -48,214 +85,130 @@ class MlPlayer:
         """
         return self.color
 
-    def move_min_max(self):
-        fen = self.board.get_fen()
-        if self.perceptron is None:
-            self.perceptron = perceptron.Perceptron(fen, "data/weights.npy")
-        data = util.get_data(fen)
-        p, a = self.perceptron.predict(data)
-        root = position_nodes.Node(p, a, fen, self.board.get_bw(), None, p*10)
-        self.BFS(root, time.time())
-        print("Minimax")
-        if self.color == "w":
-            move_node = self.minimax(root, -0.1, 1.1, True)
-        else:
-            move_node = self.minimax(root, 1.1, -0.1, False)
-
-        self.board.set_status("-")
-        self.board.set_fen(root.get_fen())
-        self.board.board_array = self.board.set_board_array()
-        self.board.add_pieces()
-
-        self.board.move_piece(move_node.get_move()[0], move_node.get_move()[1])
-        self.board.new_fen()
-
-        fen = self.board.get_fen()
-        data = util.get_data(fen)
-        p, a = self.perceptron.predict(data)
-
-        if p - move_node.get_prediction() != 0.0:
-            print("Predicted value: {}".format(p))
-            print("Target value:    {}".format(move_node.get_prediction()))
-            self.perceptron.weights = self.perceptron.back_prop(
-                a,
-                p,
-                move_node.get_prediction()
-            )
-
-            print("Saving weights")
-            util.save_weights(
-                np.array(self.perceptron.weights, dtype=object),
-                "data/weights.npy"
-            )
-            util.save_weights(
-                np.array(self.promote_perceptron.weights, dtype=object),
-                "data/promote_weights.npy"
-            )
-
-        self.board.set_status("-")
-        self.board.set_fen(root.get_fen())
-        self.board.board_array = self.board.set_board_array()
-        self.board.add_pieces()
-
-        print("\nChoosing move with prediction: {}\n".format(move_node.get_prediction()))
-        return move_node.get_move()[0], move_node.get_move()[1], move_node.get_promote()
+    def reuse_tree(self):
+        """
+        Keeps the part of the search-tree under the moves played since the last search, so the next search
+        starts from it. The tree is cleared if the position isn't found in it
+        :return: number of nodes carried over
+        """
+        node = position_nodes.NO_NODE
+        if self.last_fen is not None and len(self.tree) > 0:
+            position = Position(self.last_fen, self.board.get_move_generator())
+            child = self.tree.find_child(0, self.last_move)
+            if child != position_nodes.NO_NODE:
+                position.make_move(self.last_move)
+                for grandchild in self.tree.get_children(child):
+                    position.make_move(self.tree.get_move(grandchild))
+                    if position.get_key() == self.board.get_key():
+                        node = grandchild
+                    position.unmake_move()
+        if node == position_nodes.NO_NODE:
+            self.tree.clear()
+            return 0
+        return self.tree.reroot(node)
+
+    def guess_reply(self):
+        """
+        Guesses the opponent's move from the transposition table
+        :return: [from, to, promote], None if there is no guess
+        """
+        entry = self.table.probe(self.board.get_key())
+        if entry is None or entry[3] not in self.board.generate_legal_moves():
+            return None
+        return entry[3]
 
-    def BFS(self, root, tic):
+    def start_pondering(self):
         """
-        Breadth first search to get tree of positions
+        Guesses the opponent's move and searches the position after it in a background thread,
+        until stop_pondering() is called. The search fills the transposition table, which the next
+        search uses if the guess was right
         :return:
         """
-        depth = 1
-        print("Depth: {}".format(depth))
-        color = self.board.get_bw()
-        full_move = self.board.get_full_move()
-        node_list = [root]
-        while len(node_list) > 0:
-            node = node_list.pop(0)
-            self.board.set_fen(node.get_fen())
-            self.board.board_array = self.board.set_board_array()
-            self.board.add_pieces()
-            self.board.win_lose_draw()
-
-            if self.board.get_status() != "-":
-                continue
-            toc = time.time()
-            if toc - tic > 60.0:
-                return
-
-            # Get node-prediction for sorting on prediction
-            fen = self.board.get_fen()
-            data = util.get_data(fen)
-            node_prediction, _ = self.perceptron.predict(data)
-
-            if self.board.get_bw() == "b":
-                node_prediction = 1.0 - node_prediction
-
-            new_full_move = self.board.get_full_move()
-            new_depth = (new_full_move - full_move) * 2 + 1
-            if color == "w" and self.board.get_bw() == "b":
-                new_depth += 1
-            elif color == "b" and self.board.get_bw() == "w":
-                new_depth -= 1
-            if new_depth != depth:
-                depth = new_depth
-                print("Depth: {}".format(depth))
-
-            move_list = []
-            for row in range(8):
-                for col in range(8):
-                    fr = [row, col]
-                    moves = chess_logic.legal_moves(
-                        self.board.get_board_array(),
-                        fr,
-                        self.board.get_bw(),
-                        self.board.get_castle(),
-                        self.board.get_en_passent()
-                    )
-
-                    br_out = False
-                    for m in moves:
-                        to = [fr[0] + m[0], fr[1] + m[1]]
-
-                        # Move piece
-                        self.board.move_piece(fr, to)
-
-                        if self.board.get_promoting():
-                            for piece in ["q", "r", "b", "n"]:
-                                self.board.promote_pawn(to, piece)
-                                self.board.next_turn(visual=False)
-                                p, a, fen = self.predict_pos()
-
-                                move_list.append([[fr, to], p, a, fen, self.board.get_bw(), piece])
-
-                                if p == 1.0:
-                                    br_out = True
-
-                                self.board.set_status("-")
-                                self.board.positions_in_game[self.board.get_fen_pos()] -= 1
-
-                                if br_out:
-                                    break
-                        else:
-                            self.board.next_turn(visual=False)
-                            p, a, fen = self.predict_pos()
-
-                            move_list.append([[fr, to], p, a, fen, self.board.get_bw(), None])
-
-                            if p == 1.0:
-                                br_out = True
-
-                            self.board.set_status("-")
-                            self.board.positions_in_game[self.board.get_fen_pos()] -= 1
-
-                        self.board.set_fen(node.get_fen())
-                        self.board.board_array = self.board.set_board_array()
-                        self.board.add_pieces()
-
-                        if br_out:
-                            break
-
-            # Add moves and positions from move list to node_list and position-tree
-            for m in move_list:
-                fr = m[0][0]
-                to = m[0][1]
-                p = m[1]
-                a = m[2]
-                fen = m[3]
-                bw = m[4]
-                promote_piece = m[5]
-
-                child = position_nodes.Node(
-                    p, a, fen, bw, promote_piece, ((node_prediction * 10) + (p - node_prediction))
-                )
-                node.add_child(child, [fr, to], self.board.get_bw())
-                node_list.append(child)
-
-            # Sort node_list so it always checks the node with the greatest prediction next
-            if color == "w":
-                node_list.sort(key=sort_node_func, reverse=True)
-            elif color == "b":
-                node_list.sort(key=sort_node_func)
+        if not self.ponder or self.ponder_thread is not None or self.perceptron is None:
+            return
+        guess = self.guess_reply()
+        if guess is None:
+            return
+        position = Position(self.board.get_fen(), self.board.get_move_generator())
+        position.positions_in_game = dict(self.board.positions_in_game)
+        position.make_move(guess)
+        if len(position.generate_legal_moves()) == 0:
+            return
+        self.ponder_key = position.get_key()
+        self.ponder_search = search.Search(
+            position, self.perceptron,
+            limits.SearchLimits(max_depth=self.limits.max_depth, quiescence_ply=self.limits.quiescence_ply),
+            table=self.table, orderer=self.orderer, eval_cache=self.eval_cache, disk_cache=self.disk_cache
+        )
+        print("Pondering on {}".format(move_to_string(guess)))
+        self.ponder_thread = threading.Thread(target=self.ponder_search.run, daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        """
+        Stops pondering and checks if the opponent played the guessed move
+        :return: True if the board is in the position that was pondered on
+        """
+        if self.ponder_thread is None:
+            return False
+        self.ponder_search.stop()
+        self.ponder_thread.join()
+        hit = self.ponder_key == self.board.get_key()
+        print("Ponder {}: searched {} nodes to depth {}".format(
+            "hit" if hit else "miss", self.ponder_search.nodes, self.ponder_search.depth
+        ))
+        self.ponder_thread = None
+        self.ponder_search = None
+        self.ponder_key = None
+        return hit
 
-    def minimax(self, position, alpha, beta, maximizing_player):
+    def move_min_max(self):
         """
-        Minimax-algorithm with alpha-beta pruning
-        :return:
+        Searches for the best move with iterative-deepening alpha-beta and learns from the result
+        :return: move from, move to, piece to promote to (None if not promoting)
         """
-        if position.get_bw() == "w":
-            position.set_prediction(1.0 - position.get_prediction())
+        self.stop_pondering()
+        tic = time.time()
+        fen = self.board.get_fen()
+        if self.perceptron is None:
+            self.perceptron = perceptron.Perceptron(fen, "data/weights.npy")
+            if self.checkpoints is not None:
+                self.checkpoints.watch(self.perceptron, "data/weights.npy")
+        if self.learner is None:
+            self.learner = learner.Learner(self.perceptron)
+            self.own_learner = True
+        if self.eval_cache is None:
+            self.eval_cache = eval_cache.EvalCache(self.perceptron, self.eval_cache_size)
+        self.eval_cache.reset_counters()
+        self.board.set_status("-")
+        carried_over = self.reuse_tree()
+        print("Carried over from last move: {} tree-nodes, {:.1f} % of the transposition table".format(
+            carried_over, 100.0 * self.table.get_fill()
+        ))
+        if self.parallel is not None:
+            move, score = self.parallel.run(self.board, self.perceptron, self.limits, self.disk_cache)
+        else:
+            move, score = search.Search(
+                self.board, self.perceptron, self.limits, table=self.table, orderer=self.orderer, tree=self.tree,
+                eval_cache=self.eval_cache, disk_cache=self.disk_cache
+            ).run()
 
-        if len(position.get_children()) == 0:
-            return position
+        self.last_fen = fen
+        self.last_move = move
 
-        ret_pos = position
+        # Chance of white winning after the move, as found by the search
+        target = score if self.board.get_bw() == "w" else 1.0 - score
 
-        if maximizing_player:
-            max_eval = -0.1
-            for child in position.get_children():
-                pos = self.minimax(child, alpha, beta, False)
-                eval = pos.get_prediction()
-                if eval >= max_eval:
-                    max_eval = eval
-                    ret_pos = child
-                    ret_pos.set_prediction(eval)
-                alpha2 = max(alpha, eval)
-                if beta <= alpha2:
-                    break
-        else:
-            min_eval = 1.1
-            for child in position.get_children():
-                pos = self.minimax(child, alpha, beta, True)
-                eval = pos.get_prediction()
-                if eval <= min_eval:
-                    min_eval = eval
-                    ret_pos = child
-                    ret_pos.set_prediction(eval)
-                beta2 = min(beta, eval)
-                if beta2 <= alpha:
-                    break
-        return ret_pos
+        # Learn from the position after the move in the background, the move is not delayed by it
+        self.board.make_move(move)
+        self.learner.add_sample(self.board.get_fen(), target)
+        self.board.unmake_move()
+
+        self.limits.update_clock(time.time() - tic)
+        if self.limits.get_clock() is not None:
+            print("Clock: {:.2f} s".format(self.limits.get_clock()))
+        print("\nChoosing move with prediction: {}\n".format(target))
+        return move[0], move[1], move[2]
 
     def promote_pawn(self):
         fen = self.board.get_fen()
@@ -295,17 +248,3 @@ class MlPlayer:
         if promotion[0][0][-1] == 1:
             promote_piece = "q"
         return promote_piece
-
-    def predict_pos(self):
-        # Get fen and predict
-        fen = self.board.get_fen()
-        data = util.get_data(fen)
-        p, a = self.perceptron.predict(data)
-
-        if finished_game(self.board.get_status()):
-            p = finished_prediction(self.board.get_status())
-
-        if self.board.get_bw() == "w":
-            p = 1.0 - p
-
-        return p, a, fen
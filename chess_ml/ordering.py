@@ -0,0 +1,130 @@
+import numpy as np
+
+# Value of pieces for ordering captures
+PIECE_VALUES = {"p": 1, "n": 3, "b": 3, "r": 5, "q": 9, "k": 20}
+
+# Scores that put the groups of moves in order: hash move, captures and promotions, killers, the rest by history
+HASH_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 27
+
+
+def captured_piece(position, move):
+    """
+    Gets type of the piece a move captures
+    :param position: Position before the move
+    :param move: [from, to, promote]
+    :return: type of captured piece, None if the move doesn't capture
+    """
+    board_array = position.get_board_array()
+    fr, to = move[0], move[1]
+    content = board_array[to[0], to[1]].get_content()
+    if content is not None:
+        return content.get_type()
+    if fr[1] != to[1] and board_array[fr[0], fr[1]].get_content().get_type().lower() == "p":
+        return "p" if position.get_bw() == "w" else "P"  # Taking en-passant
+    return None
+
+
+def is_quiet(position, move):
+    """
+    Checks if a move neither captures nor promotes
+    :param position: Position before the move
+    :param move: [from, to, promote]
+    :return: True if quiet
+    """
+    return move[2] is None and captured_piece(position, move) is None
+
+
+def mvv_lva(position, move):
+    """
+    Scores a capture or promotion by most valuable victim / least valuable attacker
+    :param position: Position before the move
+    :param move: [from, to, promote]
+    :return: int, 0 for quiet moves
+    """
+    score = 0
+    victim = captured_piece(position, move)
+    if victim is not None:
+        fr = move[0]
+        attacker = position.get_board_array()[fr[0], fr[1]].get_content().get_type()
+        score += 100 * PIECE_VALUES[victim.lower()] - PIECE_VALUES[attacker.lower()]
+    if move[2] is not None:
+        score += 100 * PIECE_VALUES[move[2]]
+    return score
+
+
+class MoveOrderer:
+    """
+    Orders moves so alpha-beta finds cut-offs early. Tries the hash move first, then captures by most
+    valuable victim / least valuable attacker, then killer moves for the ply, then the rest by history
+    """
+    def __init__(self, max_ply=128):
+        """
+        Initializes move orderer
+        :param max_ply: Deepest ply to keep killer moves for
+        """
+        self.max_ply = max_ply
+        self.killers = [[None, None] for _ in range(max_ply)]
+        # Cut-offs for each color, from-square and to-square, weighted by depth
+        self.history = np.zeros((2, 64, 64), dtype=np.int64)
+
+    def new_search(self):
+        """
+        Clears killer moves and makes the history from earlier searches count less
+        :return:
+        """
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        self.history //= 2
+
+    def score_move(self, position, move, ply, hash_move=None):
+        """
+        Gives a move a score for ordering, higher is tried first
+        :param position: Position before the move
+        :param move: [from, to, promote]
+        :param ply: Moves from root
+        :param hash_move: Best move from the transposition table, or None
+        :return: int
+        """
+        if move == hash_move:
+            return HASH_SCORE
+        if not is_quiet(position, move):
+            return CAPTURE_SCORE + mvv_lva(position, move)
+        if ply < self.max_ply:
+            if move == self.killers[ply][0]:
+                return KILLER_SCORE + 1
+            if move == self.killers[ply][1]:
+                return KILLER_SCORE
+        fr, to = move[0], move[1]
+        color = 0 if position.get_bw() == "w" else 1
+        return int(self.history[color, fr[0] * 8 + fr[1], to[0] * 8 + to[1]])
+
+    def order_moves(self, position, moves, ply, hash_move=None):
+        """
+        Sorts moves with the best first
+        :param position: Position before the moves
+        :param moves: list of [from, to, promote]
+        :param ply: Moves from root
+        :param hash_move: Best move from the transposition table, or None
+        :return: sorted list of moves
+        """
+        return sorted(moves, key=lambda m: self.score_move(position, m, ply, hash_move), reverse=True)
+
+    def add_cutoff(self, position, move, depth, ply):
+        """
+        Remembers a move that made a beta cut-off. Only quiet moves are remembered,
+        since captures are ordered first anyway
+        :param position: Position before the move
+        :param move: [from, to, promote]
+        :param depth: Depth left when the move was searched
+        :param ply: Moves from root
+        :return:
+        """
+        if not is_quiet(position, move):
+            return
+        if ply < self.max_ply and move != self.killers[ply][0]:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+        fr, to = move[0], move[1]
+        color = 0 if position.get_bw() == "w" else 1
+        self.history[color, fr[0] * 8 + fr[1], to[0] * 8 + to[1]] += depth * depth
@@ -0,0 +1,234 @@
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool, Value
+from board.position import Position
+from chess_ml import search, transposition, ordering, limits, disk_cache, perceptron
+import util.util as util
+
+# Transposition table and move orderer in each worker-process. They are kept from task to task,
+# so a worker gets hits from the depths and moves it has searched before
+_table = None
+_orderer = None
+# Zobrist-key of the position the worker searched last. The table and orderer start a new search when it changes
+_root_key = None
+# Perceptron in each worker, and checksum of its weights. Is only loaded again when the weights change
+_perceptron = None
+_weights_id = None
+# Search cache opened read-only, so every worker shares the pages of the file
+_disk_cache = None
+# Nodes searched by every worker since the search started, shared with ParallelSearch
+_nodes_searched = None
+
+
+def init_worker(hash_mb, disk_cache_file=None, nodes_searched=None):
+    """
+    Sets up a worker-process
+    :param hash_mb: Megabytes for the worker's transposition table
+    :param disk_cache_file: Path of the search cache to read from, None to not use it
+    :param nodes_searched: multiprocessing.Value counting the nodes of the search, for the node limit
+    :return:
+    """
+    global _table, _orderer, _disk_cache, _nodes_searched
+    _nodes_searched = nodes_searched
+    _table = transposition.TranspositionTable(hash_mb)
+    _orderer = ordering.MoveOrderer()
+    if disk_cache_file is not None:
+        _disk_cache = disk_cache.DiskCache(disk_cache_file, read_only=True)
+        if not _disk_cache.is_open():
+            _disk_cache = None
+
+
+def load_weights(fen, weights_file, weights_id):
+    """
+    Gets the worker's perceptron, with the weights in a file published by ParallelSearch
+    :param fen: fen-string of the position to search
+    :param weights_file: Weight-file to memory-map
+    :param weights_id: Checksum of the weights in the file
+    :return: Perceptron
+    """
+    global _perceptron, _weights_id
+    if _perceptron is None:
+        _perceptron = perceptron.Perceptron(fen)
+    if _weights_id != weights_id:
+        _perceptron.set_weights(util.read_weights(weights_file))
+        _weights_id = weights_id
+    return _perceptron
+
+
+def search_root_move(args):
+    """
+    Searches one root-move in a worker-process
+    :param args: [fen, positions_in_game, move_generator, weights-file, weights-id, move, depth, alpha, deadline,
+                  node limit of the whole search, tasks in flight, quiescence ply]
+    :return: move, score for the player to move at the root (None if stopped), nodes searched,
+             of them in the quiescence search
+    """
+    global _root_key
+    fen, positions_in_game, move_generator, weights_file, weights_id, move, depth, alpha, deadline, max_nodes, \
+        in_flight, quiescence_ply = args
+    max_time = deadline - time.time()
+    if max_nodes is not None:
+        # The nodes left are shared by the tasks running at the same time
+        left = max(max_nodes - _nodes_searched.value, 0)
+        max_nodes = -(-left // in_flight)
+    position = Position(fen, move_generator)
+    position.positions_in_game = positions_in_game
+    if position.get_key() != _root_key:
+        # Ages the table's entries and clears killers, but root-moves of the same position share them
+        _table.new_search()
+        _orderer.new_search()
+        _root_key = position.get_key()
+    p_tron = load_weights(fen, weights_file, weights_id)
+    search_limits = limits.SearchLimits(max_time=max_time, max_nodes=max_nodes, quiescence_ply=quiescence_ply)
+    s = search.Search(position, p_tron, search_limits, table=_table, orderer=_orderer, disk_cache=_disk_cache)
+    try:
+        score = s.score_root_move(move, depth, alpha)
+    except search.SearchStopped:
+        score = None
+    with _nodes_searched.get_lock():
+        _nodes_searched.value += s.nodes
+    return move, score, s.nodes, s.quiescence_nodes
+
+
+class ParallelSearch:
+    """
+    Iterative-deepening search that splits the root-moves across worker-processes.
+    At each depth the best move from the last depth is searched first, and its score is used as alpha
+    for the other moves. They are sent as one task per move, so workers that finish early take the next move
+    """
+    def __init__(self, workers=2, hash_mb=16, disk_cache_file=None):
+        """
+        Starts the worker-processes
+        :param workers: Number of processes
+        :param hash_mb: Megabytes for the transposition table in each worker
+        :param disk_cache_file: Path of a search cache the workers read predictions from, None to not use it
+        """
+        if workers < 1:
+            raise ValueError("Need at least one worker, you tried " + str(workers))
+        self.workers = workers
+        self.nodes_searched = Value("q", 0)
+        self.pool = Pool(workers, initializer=init_worker, initargs=(hash_mb, disk_cache_file, self.nodes_searched))
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.depth = 0
+        # The weights are written to a file the workers memory-map, instead of being sent with every task
+        self.weights_dir = tempfile.mkdtemp(prefix="chess_ml_")
+        self.weights_file = os.path.join(self.weights_dir, "weights.npy")
+        self.weights_id = None
+
+    def close(self):
+        """
+        Stops the worker-processes
+        :return:
+        """
+        self.pool.terminate()
+        self.pool.join()
+        shutil.rmtree(self.weights_dir, ignore_errors=True)
+
+    def publish_weights(self, p_tron):
+        """
+        Writes the weights for the workers, if they changed since last time
+        :param p_tron: Perceptron
+        :return: checksum of the weights
+        """
+        weights_id = p_tron.get_weights_id()
+        if weights_id != self.weights_id:
+            util.save_weights(p_tron.weights, self.weights_file)
+            self.weights_id = weights_id
+        return weights_id
+
+    def run(self, position, p_tron, search_limits=None, disk_cache=None):
+        """
+        Searches one depth at a time until a limit is reached
+        :param position: Position (or Board) to search from. Is not changed
+        :param p_tron: Perceptron that predicts chance of white winning
+        :param search_limits: SearchLimits. Default is 60 seconds. The nodes left of the node limit are split
+                              between the tasks running at the same time
+        :param disk_cache: DiskCache to read and write the result for the position in, None to not use it.
+                           The workers only read their own read-only view of the file
+        :return: best move [from, to, promote], score for the player to move
+        """
+        if search_limits is None:
+            search_limits = limits.SearchLimits(max_time=60.0)
+        # Every depth and worker uses the same weights, even if a learner changes them while searching
+        p_tron = p_tron.snapshot()
+        time_manager = limits.TimeManager(search_limits)
+        time_manager.start(position.get_full_move())
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.nodes_searched.value = 0
+        self.depth = 0
+        # Captures first by most valuable victim / least valuable attacker, so the first depth gets a good alpha early
+        root_moves = ordering.MoveOrderer().order_moves(position, position.generate_legal_moves(), 0)
+        if len(root_moves) == 0:
+            raise Exception("No legal moves to search")
+        best_move = root_moves[0]
+        best_score = search.LOSS
+        fen = position.get_fen()
+        weights_id = self.publish_weights(p_tron)
+        if disk_cache is not None:
+            stored = disk_cache.get_search(position.get_key(), weights_id)
+            if stored is not None and stored[2] in root_moves:
+                depth, score, move = stored
+                if depth is not None and depth >= search_limits.max_depth:
+                    print("Found in search cache: depth: {}, score: {:.4f}".format(depth, score))
+                    self.depth = depth
+                    return move, score
+                root_moves.remove(move)
+                root_moves.insert(0, move)
+
+        for depth in range(1, search_limits.max_depth + 1):
+            deadline = time_manager.tic + time_manager.hard_limit
+            jobs = [
+                [fen, position.positions_in_game, position.get_move_generator(), self.weights_file, weights_id, move,
+                 depth, search.LOSS, deadline, search_limits.max_nodes, 1, search_limits.quiescence_ply]
+                for move in root_moves
+            ]
+            scores, complete = self.search_jobs(jobs[:1])
+            if complete and len(jobs) > 1:
+                for job in jobs[1:]:
+                    job[7] = scores[0][1]
+                    job[10] = min(self.workers, len(jobs) - 1)
+                rest, complete = self.search_jobs(jobs[1:])
+                scores += rest
+            scores.sort(key=lambda s: s[1], reverse=True)
+            if not complete:
+                # Use the part of the depth that was searched. The other moves are only searched after the first
+                if scores:
+                    best_move, best_score = scores[0]
+                break
+            best_move, best_score = scores[0]
+            self.depth = depth
+            if disk_cache is not None:
+                disk_cache.put_search(position.get_key(), weights_id, depth, best_score, best_move)
+            # Search the best moves first at the next depth, so they are done if time runs out
+            root_moves = [m for m, _ in scores]
+            print("Depth: {}, score: {:.4f}, nodes: {} (quiescence: {}), time: {:.2f} s, workers: {}".format(
+                depth, best_score, self.nodes, self.quiescence_nodes, time_manager.elapsed(), self.workers
+            ))
+            if best_score == search.WIN or not time_manager.start_new_depth():
+                break
+            if search_limits.max_nodes is not None and self.nodes >= search_limits.max_nodes:
+                break
+        if disk_cache is not None:
+            disk_cache.flush()
+        return best_move, best_score
+
+    def search_jobs(self, jobs):
+        """
+        Searches root-moves in the pool
+        :param jobs: list of arguments for search_root_move
+        :return: list of [move, score] for the moves that were searched, True if every move was searched
+        """
+        scores = []
+        complete = True
+        for move, score, nodes, quiescence_nodes in self.pool.imap_unordered(search_root_move, jobs):
+            self.nodes += nodes
+            self.quiescence_nodes += quiescence_nodes
+            if score is None:
+                complete = False
+            else:
+                scores.append([move, score])
+        return scores, complete
@@ -1,27 +1,70 @@
+import copy
 import util.util as util
 import numpy as np
-import math
 
 
 def sigmoid(x):
     """
     Logistic function for perceptron
-    :param x: value to pass through logistic function
-    :return: Float between 0.0 and 1.0
+    :param x: value or numpy-array to pass through logistic function
+    :return: Float or array with values between 0.0 and 1.0
     """
-    try:
-        return 1 / (1 + math.exp(-x))
-    except OverflowError:
-        if x < -50.0:
-            return 1.0
-        return 0.0
+    # Clip to keep np.exp from overflowing in float32
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -80.0, 80.0)))
 
 
 class Perceptron:
-    def __init__(self, fen, file):
+    def __init__(self, fen, file=None):
+        """
+        Initializes perceptron
+        :param fen: fen-string, used to find the number of inputs when new weights are made
+        :param file: "data/weights.npy" or "data/promote_weights.npy". None to start without weights,
+                     which are then given with set_weights()
+        """
         self.fen = fen
         self.weights = []
-        self.init_weights(file)
+        # Counts changes of weights, so caches of predictions know when they are out of date
+        self.version = 0
+        self.weights_id = None
+        self.weights_id_version = -1
+        if file is not None:
+            self.init_weights(file)
+
+    def get_version(self):
+        """
+        Gets version of the weights. Changes every time set_weights() is called
+        :return: int
+        """
+        return self.version
+
+    def get_weights_id(self):
+        """
+        Gets checksum of the weights. Is the same for the same weights in every process and every run,
+        so it can be stored with results that depend on the weights. Same as the checksum in the weight-file
+        :return: 32-bit int
+        """
+        if self.weights_id_version != self.version:
+            self.weights_id = util.weights_checksum(self.weights)
+            self.weights_id_version = self.version
+        return self.weights_id
+
+    def set_weights(self, weights):
+        """
+        Sets new weights, e.g. from back_prop(). The list is replaced, not changed, so snapshots and
+        predictions running in other threads keep using the old weights
+        :param weights: list of weight-matrices
+        :return:
+        """
+        self.weights = weights
+        self.version += 1
+
+    def snapshot(self):
+        """
+        Gets a perceptron with the weights this one has now. It shares the weight-matrices, but keeps them
+        when new weights are set here, so a search sees the same weights from start to end
+        :return: Perceptron
+        """
+        return copy.copy(self)
 
     def init_weights(self, file):
         """
@@ -41,7 +84,7 @@ class Perceptron:
                 ], dtype=object)
             )
             for w in ret:
-                self.weights.append(w)
+                self.weights.append(np.ascontiguousarray(w, dtype=np.float32))
 
         elif file == "data/promote_weights.npy":
             length = len(util.get_promote_data(self.fen, "n"))
@@ -55,73 +98,166 @@ class Perceptron:
                 ], dtype=object)
             )
             for w in ret:
-                self.weights.append(w)
+                self.weights.append(np.ascontiguousarray(w, dtype=np.float32))
         else:
             raise Exception("Filename should either be \"data/weights.npy\" or \"data/promote_weights.npy\"")
 
-    def predict(self, data):
+    def feed_forward(self, activation, first_layer=0):
         """
-        Predicts chance of winning from fen-string and move
-        :param data: a list with all the data
-        :return: chance of winning
+        Runs data through every layer of the perceptron
+        :param activation: numpy-array with one position, or a 2d numpy-array with one position per row
+        :param first_layer: Index of the first weight-matrix to use. activation is the input to this layer
+        :return: output-layer, activations for each layer (input first)
         """
-        output = 0.5
-        activation = data.copy()
+        # Every layer from the same list, in case new weights are set in another thread
+        weights = self.weights
         activations = [activation]
-        for lr in range(len(self.weights)):
-            biased_data = util.add_bias(activation)
-            layer = np.zeros(len(self.weights[lr].T))
-            for to_node in range(len(layer)):
-                for w in range(len(self.weights[lr])):
-                    b_data = biased_data[w]
-                    if b_data != 0:
-                        weight = self.weights[lr][w, to_node]
-                        layer[to_node] += b_data * weight
-                layer[to_node] = sigmoid(layer[to_node])
-            if lr == len(self.weights) - 1:
-                output = layer[0]
-            else:
-                activation = layer.copy()
+        layer = activation
+        for lr in range(first_layer, len(weights)):
+            # First row of each weight-matrix is the bias-weight (bias-input is -1)
+            layer = sigmoid(activation @ weights[lr][1:] - weights[lr][0])
+            if lr != len(weights) - 1:
+                activation = layer
                 activations.append(activation)
-        return output, activations
+        return layer, activations
+
+    def predict(self, data):
+        """
+        Predicts chance of winning from fen-string and move
+        :param data: a list or numpy-array with all the data
+        :return: chance of winning, activations for each layer (input first)
+        """
+        layer, activations = self.feed_forward(np.asarray(data, dtype=np.float32))
+        return float(layer[0]), activations
+
+    def predict_batch(self, data_list):
+        """
+        Predicts chance of winning for many positions with one matrix-multiplication per layer
+        :param data_list: list of data-lists, or a 2d numpy-array with one position per row
+        :return: numpy-array with chance of winning for each position,
+                 activations for each layer (input first, one row per position)
+        """
+        data = np.asarray(data_list, dtype=np.float32)
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        layer, activations = self.feed_forward(data)
+        return layer[:, 0], activations
+
+    def new_accumulator(self, data):
+        """
+        Makes an accumulator for the first hidden layer of the perceptron
+        :param data: a list or numpy-array with all the data for the position
+        :return: Accumulator
+        """
+        return Accumulator(self.weights[0], np.flatnonzero(data))
+
+    def predict_accumulated(self, values):
+        """
+        Predicts chance of winning from first hidden layer (before the logistic function),
+        as kept by an Accumulator
+        :param values: numpy-array with one position, or a 2d numpy-array with one position per row
+        :return: chance of winning (numpy-array if values is 2d),
+                 activations for each hidden layer (first hidden layer first)
+        """
+        layer, activations = self.feed_forward(sigmoid(np.asarray(values, dtype=np.float32)), first_layer=1)
+        if layer.ndim == 1:
+            return float(layer[0]), activations
+        return layer[:, 0], activations
 
     def back_prop(self, data, predict, target, eta=0.1):
         """
         Backpropagation for perceptron. Updates weights.
-        :param data: old weights and activations
-        :param predict: Predicted value
-        :param target: Target value
+        Takes either one sample (as returned by predict) or a mini-batch of samples
+        (as returned by predict_batch), in which case the weight-updates are averaged.
+        :param data: activations for each layer (input first)
+        :param predict: Predicted value, or numpy-array of predicted values
+        :param target: Target value, or numpy-array of target values
         :param eta: Learning Rate
         :return: new weights
         """
-        ret_weights = []
-        full_data = data.copy()
-        full_data.append([predict])
-        delta = [(predict - target) * predict * (1 - predict)]
-        for lr in range(-1, -len(self.weights)-1, -1):
-            new_weights = np.array([self.weights[lr][i] for i in range(len(self.weights[lr]))])
-            current_data = full_data[lr]
-            biased_activation = util.add_bias(full_data[lr - 1])
-            delta.append([])
-            for i in range(len(new_weights)):
-                if lr != abs(len(self.weights)):
-                    delta[abs(lr)].append(
-                        biased_activation[i] * (1 - biased_activation[i])
-                    )
-                if lr == -1:
-                    new_weights[i] = new_weights[i] - eta * delta[0] * current_data[0]
-                    delta[abs(lr)][i] += delta[0] * self.weights[lr][i]
-                elif lr != -len(self.weights):
-                    delta_times = 0.0
-                    for j in range(len(new_weights[i])):
-                        new_weights[i][j] = self.weights[lr][i][j] - eta * delta[abs(lr+1)][j+1] * biased_activation[i]
-                        delta_times += delta[abs(lr+1)][j+1] * self.weights[lr][i][j]
-                    delta[abs(lr)][i] = delta[abs(lr)][i] * delta_times
-                else:
-                    if biased_activation[i] != 0:
-                        for j in range(len(new_weights[i])):
-                            new_weights[i][j] = self.weights[lr][i][j] - eta \
-                                                * delta[abs(lr+1)][j+1] * biased_activation[i]
-            ret_weights.append(new_weights)
-        ret_weights.reverse()
+        predict = np.atleast_1d(np.asarray(predict, dtype=np.float32))
+        target = np.broadcast_to(np.asarray(target, dtype=np.float32), predict.shape)
+        activations = [np.asarray(a, dtype=np.float32).reshape(len(predict), -1) for a in data]
+        n = len(predict)
+
+        ret_weights = [None for _ in self.weights]
+        delta_out = (predict - target) * predict * (1 - predict)
+        delta = None
+        for lr in range(len(self.weights) - 1, -1, -1):
+            weights = self.weights[lr]
+            biased_activation = np.concatenate(
+                [-np.ones((n, 1), dtype=np.float32), activations[lr]], axis=1
+            )
+            if lr == len(self.weights) - 1:
+                # Output-layer
+                ret_weights[lr] = weights - eta * np.mean(delta_out * predict)
+                delta = biased_activation * (1 - biased_activation) + delta_out[:, None] * weights[:, 0]
+            else:
+                # Skip the delta of the bias-node in the layer above
+                ret_weights[lr] = weights - eta * (biased_activation.T @ delta[:, 1:]) / n
+                if lr > 0:
+                    delta = biased_activation * (1 - biased_activation) * (delta[:, 1:] @ weights.T)
         return ret_weights
+
+
+class Accumulator:
+    """
+    Keeps the first hidden layer of a perceptron (before the logistic function) for a position.
+    Only a few of the inputs change when a move is made, so the layer is updated by adding the
+    weight-rows for pieces put on a square and subtracting the rows for pieces taken off a square,
+    instead of multiplying all the inputs with the whole weight-matrix.
+    The layers for each ply are rows of one preallocated array, which are updated in place
+    """
+    def __init__(self, weights, indices, max_ply=128):
+        """
+        Initializes accumulator
+        :param weights: Weight-matrix of first layer, with the bias-weights in the first row
+        :param indices: Indices of non-zero inputs of the position
+        :param max_ply: Moves to make room for at first. Grows when needed
+        """
+        self.weights = weights
+        self.rows = weights[1:]
+        self.stack = np.empty((max_ply + 1, weights.shape[1]), dtype=np.float32)
+        self.ply = 0
+        self.refresh(indices)
+
+    def refresh(self, indices):
+        """
+        Computes the layer from scratch and empties the stack of previous layers
+        :param indices: Indices of non-zero inputs of the position
+        :return:
+        """
+        self.ply = 0
+        np.subtract(self.rows[indices].sum(axis=0), self.weights[0], out=self.stack[0])
+
+    def push(self, added, removed):
+        """
+        Updates layer after a move. The previous layer is kept so pop() can undo the move
+        :param added: Indices of inputs that changed from 0 to 1
+        :param removed: Indices of inputs that changed from 1 to 0
+        :return:
+        """
+        if self.ply + 1 == len(self.stack):
+            self.stack = np.concatenate([self.stack, np.empty_like(self.stack)])
+        values = self.stack[self.ply + 1]
+        np.copyto(values, self.stack[self.ply])
+        for i in added:
+            np.add(values, self.rows[i], out=values)
+        for i in removed:
+            np.subtract(values, self.rows[i], out=values)
+        self.ply += 1
+
+    def pop(self):
+        """
+        Undoes last push
+        :return:
+        """
+        self.ply -= 1
+
+    def get_values(self):
+        """
+        Gets first hidden layer (before the logistic function). Is overwritten by the next push,
+        copy it to keep it
+        :return: numpy-array
+        """
+        return self.stack[self.ply]
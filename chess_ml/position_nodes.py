@@ -1,99 +1,242 @@
-import copy
+import numpy as np
+from chess_ml.transposition import encode_move, decode_move, NO_MOVE
 
+NO_NODE = -1
 
-def sort_children_func(e):
-    return e.get_prediction()
 
-
-class Node:
-    def __init__(self, prediction, activation, fen, bw, promote, sort_prediction):
-        self.prediction = prediction
-        self.activation = activation
-        self.fen = fen
-        self.children = []
-        self.visited = False
-        self.fr = None
-        self.to = None
-        self.bw = bw
-        self.promote = promote
-        self.sort_prediction = sort_prediction
-
-    def get_sort_prediction(self):
-        return self.sort_prediction
-
-    def get_promote(self):
-        return self.promote
-
-    def set_prediction(self, prediction):
+class NodePool:
+    """
+    Search-tree stored in parallel numpy-arrays with one entry per node. The children of a node are next to
+    each other, so a node only stores its parent, the move to it, its score and where its children are.
+    Positions and activations are not stored, they are made again from the moves when needed
+    """
+    def __init__(self, max_ply=4, capacity=1024, max_nodes=1 << 22):
         """
-        Sets prediction of node
-        :param prediction:
-        :return:
+        Initializes an empty tree
+        :param max_ply: Nodes are only expanded (get children) this many moves from the root
+        :param capacity: Nodes to make room for at first. Grows when needed
+        :param max_nodes: Most nodes to store. Nodes are not expanded when the pool is full
+        """
+        self.max_ply = max_ply
+        self.max_nodes = max_nodes
+        self.size = 0
+        self.parents = np.zeros(capacity, dtype=np.int32)
+        self.moves = np.zeros(capacity, dtype=np.int16)
+        self.scores = np.zeros(capacity, dtype=np.float32)
+        self.depths = np.zeros(capacity, dtype=np.int8)
+        self.first_children = np.zeros(capacity, dtype=np.int32)
+        self.child_counts = np.zeros(capacity, dtype=np.int16)
+
+    def __len__(self):
+        return self.size
+
+    def arrays(self):
         """
-        self.prediction = prediction
+        Gets the arrays that store the nodes
+        :return: list of numpy-arrays
+        """
+        return [self.parents, self.moves, self.scores, self.depths, self.first_children, self.child_counts]
 
-    def get_prediction(self):
+    def bytes_per_node(self):
         """
-        Gets prediction of node
-        :return:
+        Gets memory used by one node
+        :return: bytes
         """
-        return self.prediction
+        return sum(a.itemsize for a in self.arrays())
 
-    def get_activation(self):
+    def get_memory(self):
         """
-        Gets activation of node
-        :return:
+        Gets memory used by the arrays, including room not used yet
+        :return: bytes
         """
-        return self.activation
+        return sum(a.nbytes for a in self.arrays())
 
-    def get_fen(self):
+    def clear(self):
         """
-        Gets fen-string of node
+        Removes every node
         :return:
         """
-        return self.fen
+        self.size = 0
 
-    def add_child(self, child, move, bw):
+    def grow(self, needed):
         """
-        Adds child to child-list
-        :param child: the child-node
-        :param move: Move to get to child
-        :param bw: Black or White to move
+        Makes room for more nodes
+        :param needed: Number of nodes that must fit
         :return:
         """
-        self.children.append(child)
-        child.add_move(move)
+        capacity = len(self.parents)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.parents = np.resize(self.parents, capacity)
+        self.moves = np.resize(self.moves, capacity)
+        self.scores = np.resize(self.scores, capacity)
+        self.depths = np.resize(self.depths, capacity)
+        self.first_children = np.resize(self.first_children, capacity)
+        self.child_counts = np.resize(self.child_counts, capacity)
+
+    def add_nodes(self, parent, moves):
+        """
+        Adds nodes next to each other
+        :param parent: Index of parent-node, NO_NODE for a root
+        :param moves: list of encoded moves to the nodes
+        :return: index of the first node
+        """
+        first = self.size
+        self.grow(first + len(moves))
+        end = first + len(moves)
+        self.parents[first:end] = parent
+        self.moves[first:end] = moves
+        self.scores[first:end] = np.nan
+        self.depths[first:end] = -1
+        self.first_children[first:end] = NO_NODE
+        self.child_counts[first:end] = 0
+        self.size = end
+        return first
+
+    def add_root(self):
+        """
+        Clears the tree and adds a root-node
+        :return: index of root (0)
+        """
+        self.clear()
+        return self.add_nodes(NO_NODE, [NO_MOVE])
 
-    def sort_children(self, rev):
+    def expand(self, node, moves):
         """
-        Sorts children based on prediction
-        :param rev: If sorting should be reversed
-        :return:
+        Adds children to a node, if it has none
+        :param node: Index of node
+        :param moves: list of legal moves [from, to, promote] in the node's position
+        :return: True if the node has children
+        """
+        if self.child_counts[node] > 0:
+            return True
+        if len(moves) == 0 or self.size + len(moves) > self.max_nodes:
+            return False
+        self.first_children[node] = self.add_nodes(node, [encode_move(m) for m in moves])
+        self.child_counts[node] = len(moves)
+        return True
+
+    def get_children(self, node):
+        """
+        Gets indexes of the children of a node
+        :param node: Index of node
+        :return: range of indexes
         """
-        self.children.sort(key=sort_children_func, reverse=rev)
+        first = int(self.first_children[node])
+        return range(first, first + int(self.child_counts[node]))
 
-    def get_children(self):
+    def find_child(self, node, move):
         """
-        Gets list of children
+        Finds the child a move leads to
+        :param node: Index of node
+        :param move: [from, to, promote]
+        :return: index of child, NO_NODE if the node isn't expanded
+        """
+        count = int(self.child_counts[node])
+        if count == 0:
+            return NO_NODE
+        first = int(self.first_children[node])
+        found = np.flatnonzero(self.moves[first:first + count] == encode_move(move))
+        if len(found) == 0:
+            return NO_NODE
+        return first + int(found[0])
+
+    def set_score(self, node, score, depth):
+        """
+        Sets score of a node
+        :param node: Index of node
+        :param score: Score for the player to move in the node
+        :param depth: Depth the node was searched to
         :return:
         """
-        return self.children
+        self.scores[node] = score
+        self.depths[node] = min(depth, 127)
 
-    def visit(self):
-        self.visited = True
-
-    def unvisit(self):
-        self.visited = False
+    def get_score(self, node):
+        """
+        Gets score of a node
+        :param node: Index of node
+        :return: score for the player to move in the node, nan if not searched
+        """
+        return float(self.scores[node])
 
-    def is_visited(self):
-        return self.visited
+    def get_move(self, node):
+        """
+        Gets the move to a node
+        :param node: Index of node
+        :return: [from, to, promote], None for a root
+        """
+        return decode_move(self.moves[node])
 
-    def add_move(self, move):
-        self.fr = move[0]
-        self.to = move[1]
+    def get_parent(self, node):
+        """
+        Gets parent of a node
+        :param node: Index of node
+        :return: index of parent, NO_NODE for a root
+        """
+        return int(self.parents[node])
 
-    def get_move(self):
-        return self.fr, self.to
+    def get_depth(self, node):
+        """
+        Gets depth a node was searched to
+        :param node: Index of node
+        :return: depth, -1 if not searched
+        """
+        return int(self.depths[node])
 
-    def get_bw(self):
-        return self.bw
+    def best_child(self, node):
+        """
+        Gets the child searched deepest, with the best score for the player to move in the node
+        :param node: Index of node
+        :return: index of child, NO_NODE if no child is searched
+        """
+        best = NO_NODE
+        for child in self.get_children(node):
+            if self.depths[child] < 0:
+                continue
+            if (
+                    best == NO_NODE
+                    or self.depths[child] > self.depths[best]
+                    or (self.depths[child] == self.depths[best] and self.scores[child] < self.scores[best])
+            ):
+                best = child
+        return best
+
+    def reroot(self, node):
+        """
+        Keeps only the nodes under a node, with the node as the new root
+        :param node: Index of node
+        :return: number of nodes kept
+        """
+        # Old indexes in new order. Children are added as a block, so they stay next to each other
+        order = [node]
+        i = 0
+        while i < len(order):
+            n = order[i]
+            if self.child_counts[n] > 0:
+                order.extend(self.get_children(n))
+            i += 1
+        order = np.array(order, dtype=np.int64)
+        new_index = np.full(self.size, NO_NODE, dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+
+        has_children = self.child_counts[order] > 0
+        first_children = np.where(has_children, new_index[np.maximum(self.first_children[order], 0)], NO_NODE)
+        parents = new_index[np.maximum(self.parents[order], 0)]
+        parents[0] = NO_NODE
+        moves = self.moves[order]
+        moves[0] = NO_MOVE
+        scores = self.scores[order]
+        depths = self.depths[order]
+        child_counts = self.child_counts[order]
+
+        self.size = len(order)
+        self.parents[:self.size] = parents
+        self.moves[:self.size] = moves
+        self.scores[:self.size] = scores
+        self.depths[:self.size] = depths
+        self.first_children[:self.size] = first_children
+        self.child_counts[:self.size] = child_counts
+        return self.size
@@ -0,0 +1,509 @@
+import numpy as np
+import util.util as util
+from chess_ml import transposition, ordering, limits, position_nodes
+
+# Scores are chance of winning for the player to move, so a score for the other player is 1 - score
+WIN = 1.0
+LOSS = 0.0
+DRAW = 0.5
+
+
+class SearchStopped(Exception):
+    """
+    Raised inside the search when the time or node limit is reached
+    """
+    pass
+
+
+class Search:
+    """
+    Iterative-deepening alpha-beta search (negamax).
+    Searches depth-first with make_move/unmake_move on the position and evaluates leaves with the
+    perceptron as they are reached, so memory only grows with the depth of the search.
+    """
+    def __init__(self, position, p_tron, search_limits=None, table=None, orderer=None, tree=None, eval_cache=None,
+                 disk_cache=None):
+        """
+        Initializes search
+        :param position: Position (or Board) to search from. Is the same position when the search is done
+        :param p_tron: Perceptron that predicts chance of white winning
+        :param search_limits: SearchLimits with time, nodes, depth and clock. Default is 60 seconds
+        :param table: TranspositionTable to use, can be kept between searches. None to search without
+        :param orderer: MoveOrderer to use, can be kept between searches.
+                        None to try moves in generated order, with only the hash move first
+        :param tree: NodePool to store the top of the search-tree in, None to not store it.
+                     A tree that isn't empty is used as the tree of the position from an earlier search
+        :param eval_cache: EvalCache for the perceptron's predictions, None to not cache them
+        :param disk_cache: DiskCache with predictions and search-results from earlier runs, None to not use it
+        """
+        self.position = position
+        # Weights can be changed by a learner while searching, so the search keeps the ones it started with
+        self.perceptron = p_tron.snapshot()
+        if search_limits is None:
+            search_limits = limits.SearchLimits(max_time=60.0)
+        self.limits = search_limits
+        self.time_manager = limits.TimeManager(search_limits)
+        self.table = table
+        self.orderer = orderer
+        self.tree = tree
+        self.eval_cache = eval_cache
+        if eval_cache is not None:
+            eval_cache.set_perceptron(self.perceptron)
+        self.disk_cache = disk_cache
+        # Checksum of the weights, which results in the disk cache have to be made with
+        self.weights_id = None
+        # Tree-node of each position from the root to the current position, NO_NODE if not stored
+        self.path = []
+        self.accumulator = None
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.depth = 0
+        self.stopped = False
+
+    def stop(self):
+        """
+        Stops the search at the next node. Can be called from another thread
+        :return:
+        """
+        self.stopped = True
+
+    def limit_reached(self):
+        """
+        Checks if the node limit or the hard time limit is reached
+        :return: True if the search should stop now
+        """
+        if self.limits.max_nodes is not None and self.nodes >= self.limits.max_nodes:
+            return True
+        return self.time_manager.time_up()
+
+    def run(self):
+        """
+        Searches one depth at a time until a limit is reached
+        :return: best move [from, to, promote], score for the player to move
+        """
+        self.time_manager.start(self.position.get_full_move())
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        if self.table is not None:
+            self.table.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+        if self.disk_cache is not None:
+            self.weights_id = self.perceptron.get_weights_id()
+            self.disk_cache.reset_counters()
+        root = position_nodes.NO_NODE
+        first_move = self.hash_move()
+        stored = self.stored_search()
+        if stored is not None:
+            depth, score, move = stored
+            if depth is not None and depth >= self.limits.max_depth:
+                print("Found in search cache: depth: {}, score: {:.4f}".format(depth, score))
+                self.depth = depth
+                return move, score
+            if first_move is None:
+                first_move = move
+        if self.tree is not None:
+            if len(self.tree) == 0:
+                root = self.tree.add_root()
+            else:
+                root = 0
+                if first_move is None and self.tree.best_child(root) != position_nodes.NO_NODE:
+                    first_move = self.tree.get_move(self.tree.best_child(root))
+        root_moves = self.order_moves(self.position.generate_legal_moves(), 0, first_move)
+        if len(root_moves) == 0:
+            raise Exception("No legal moves to search")
+        best_move = root_moves[0]
+        if self.tree is not None:
+            self.tree.expand(root, root_moves)
+        best_score = self.evaluate()
+        undo_depth = len(self.position.undo_stack)
+
+        for depth in range(1, self.limits.max_depth + 1):
+            self.accumulator = self.perceptron.new_accumulator(util.get_data(self.position.get_fen()))
+            # Search best move from last depth first, so a partly searched depth can still be used
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+            iteration_move = None
+            iteration_score = LOSS - 1.0
+            self.path = [root]
+            try:
+                for move in root_moves:
+                    score = 1.0 - self.search_move(move, depth - 1, 1.0 - WIN, 1.0 - max(iteration_score, LOSS), 1)
+                    if score > iteration_score:
+                        iteration_score = score
+                        iteration_move = move
+            except SearchStopped:
+                # Take back the moves made when the search was stopped
+                while len(self.position.undo_stack) > undo_depth:
+                    self.position.unmake_move()
+                if iteration_move is not None:
+                    best_move = iteration_move
+                    best_score = iteration_score
+                break
+            best_move = iteration_move
+            best_score = iteration_score
+            self.depth = depth
+            if self.table is not None:
+                self.table.store(self.position.get_key(), depth, best_score, transposition.EXACT, best_move)
+            if self.tree is not None:
+                self.tree.set_score(root, best_score, depth)
+            if self.disk_cache is not None:
+                self.disk_cache.put_search(self.position.get_key(), self.weights_id, depth, best_score, best_move)
+            print("Depth: {}, score: {:.4f}, nodes: {} (quiescence: {}), time: {:.2f} s".format(
+                depth, best_score, self.nodes, self.quiescence_nodes, self.time_manager.elapsed()
+            ))
+            if best_score == WIN or self.stopped or self.limit_reached() or not self.time_manager.start_new_depth():
+                break
+        if self.table is not None:
+            print("Transposition table: hit rate: {:.1f} %, fill: {:.1f} %".format(
+                100.0 * self.table.get_hit_rate(), 100.0 * self.table.get_fill()
+            ))
+        if self.eval_cache is not None:
+            print("Evaluation cache: hits: {}, misses: {}, hit rate: {:.1f} %, size: {}".format(
+                self.eval_cache.get_hits(), self.eval_cache.get_misses(),
+                100.0 * self.eval_cache.get_hit_rate(), len(self.eval_cache)
+            ))
+        if self.disk_cache is not None:
+            self.disk_cache.flush()
+            print("Search cache: hit rate: {:.1f} %".format(100.0 * self.disk_cache.get_hit_rate()))
+        if self.tree is not None:
+            print("Search tree: {} nodes, {} bytes per node, {:.1f} kB".format(
+                len(self.tree), self.tree.bytes_per_node(), self.tree.get_memory() / 1024
+            ))
+        return best_move, best_score
+
+    def score_root_move(self, move, depth, alpha=LOSS):
+        """
+        Searches one root-move to a depth. Used when the root-moves are split across processes.
+        The time manager is started here, and SearchStopped is raised if a limit is reached
+        :param move: [from, to, promote]
+        :param depth: Depth to search to, counting the move
+        :param alpha: Score the player to move at the root is sure to get from another move.
+                      A returned score at or below alpha is only an upper bound
+        :return: score for the player to move at the root
+        """
+        self.time_manager.start(self.position.get_full_move())
+        self.nodes = 0
+        if self.disk_cache is not None:
+            self.weights_id = self.perceptron.get_weights_id()
+        self.accumulator = self.perceptron.new_accumulator(util.get_data(self.position.get_fen()))
+        return 1.0 - self.search_move(move, depth - 1, 1.0 - WIN, 1.0 - alpha, 1)
+
+    def search_move(self, move, depth, alpha, beta, ply):
+        """
+        Makes move, searches the position after it and takes the move back
+        :param move: [from, to, promote]
+        :param depth: Depth left after the move
+        :param alpha: Lowest score the player after the move is sure to get
+        :param beta: Highest score the player after the move can get before the other player avoids it
+        :param ply: Moves from root after the move
+        :return: score for the player to move after the move
+        """
+        node = position_nodes.NO_NODE
+        if self.tree is not None and self.path[-1] != position_nodes.NO_NODE:
+            node = self.tree.find_child(self.path[-1], move)
+        self.make_move(move)
+        self.path.append(node)
+        score = self.alpha_beta(depth, alpha, beta, ply)
+        self.path.pop()
+        self.unmake_move()
+        if node != position_nodes.NO_NODE:
+            self.tree.set_score(node, score, depth)
+        return score
+
+    def alpha_beta(self, depth, alpha, beta, ply):
+        """
+        Alpha-beta search of the position
+        :param depth: Depth left
+        :param alpha: Lowest score the player to move is sure to get
+        :param beta: Highest score the player to move can get before the other player avoids it
+        :param ply: Moves from root
+        :return: score for the player to move
+        """
+        self.count_node()
+        if self.is_draw():
+            return DRAW
+        if depth == 0:
+            if self.limits.quiescence_ply > 0:
+                return self.quiescence(alpha, beta, 0)
+            return self.evaluate()
+
+        key = self.position.get_key()
+        hash_move = None
+        if self.table is not None:
+            entry = self.table.probe(key)
+            if entry is not None:
+                entry_depth, entry_score, bound, hash_move = entry
+                if entry_depth >= depth:
+                    if bound == transposition.EXACT:
+                        return entry_score
+                    if bound == transposition.LOWER and entry_score >= beta:
+                        return entry_score
+                    if bound == transposition.UPPER and entry_score <= alpha:
+                        return entry_score
+
+        moves = self.position.generate_legal_moves()
+        if len(moves) == 0:
+            return LOSS if self.position.in_check() else DRAW
+        if self.tree is not None and self.path[-1] != position_nodes.NO_NODE and ply < self.tree.max_ply:
+            self.tree.expand(self.path[-1], moves)
+
+        alpha_start = alpha
+        best_score = LOSS - 1.0
+        best_move = None
+        if depth == 1:
+            # Evaluate the quiet moves in one batch. Captures and promotions, and quiet moves the other player
+            # can answer with a capture or promotion, get a quiescence search
+            quiet = moves
+            if self.limits.quiescence_ply > 0:
+                quiet = []
+                noisy = []
+                for move in moves:
+                    if ordering.is_quiet(self.position, move) and not self.has_noisy_reply(move):
+                        quiet.append(move)
+                    else:
+                        noisy.append(move)
+                moves = noisy
+            else:
+                moves = []
+            if quiet:
+                best_move, best_score = self.best_child(quiet)
+                alpha = max(alpha, best_score)
+        for move in self.order_moves(moves, ply, hash_move):
+            if alpha >= beta:
+                break
+            score = 1.0 - self.search_move(move, depth - 1, 1.0 - beta, 1.0 - alpha, ply + 1)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta and self.orderer is not None:
+                    self.orderer.add_cutoff(self.position, move, depth, ply)
+        if best_score >= beta:
+            bound = transposition.LOWER
+        elif best_score <= alpha_start:
+            bound = transposition.UPPER
+        else:
+            bound = transposition.EXACT
+        self.store(key, depth, best_score, bound, best_move)
+        return best_score
+
+    def quiescence(self, alpha, beta, q_ply):
+        """
+        Searches only captures and promotions, so positions are not evaluated in the middle of an exchange.
+        The player to move can stand pat (take the evaluation) instead of capturing
+        :param alpha: Lowest score the player to move is sure to get
+        :param beta: Highest score the player to move can get before the other player avoids it
+        :param q_ply: Moves made in the quiescence search
+        :return: score for the player to move
+        """
+        best_score = self.evaluate()
+        if best_score >= beta or q_ply >= self.limits.quiescence_ply:
+            return best_score
+        alpha = max(alpha, best_score)
+        moves = [m for m in self.position.generate_legal_moves() if not ordering.is_quiet(self.position, m)]
+        moves.sort(key=lambda m: ordering.mvv_lva(self.position, m), reverse=True)
+        for move in moves:
+            self.make_move(move)
+            self.count_node()
+            self.quiescence_nodes += 1
+            score = 1.0 - self.quiescence(1.0 - beta, 1.0 - alpha, q_ply + 1)
+            self.unmake_move()
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return best_score
+
+    def count_node(self):
+        """
+        Counts a searched node and stops the search if a limit is reached
+        :return:
+        """
+        self.nodes += 1
+        if self.stopped:
+            raise SearchStopped()
+        if self.limits.max_nodes is not None and self.nodes >= self.limits.max_nodes:
+            raise SearchStopped()
+        if self.nodes % 256 == 0 and self.time_manager.time_up():
+            raise SearchStopped()
+
+    def order_moves(self, moves, ply, hash_move):
+        """
+        Orders moves with the move orderer, or puts only the hash move first if there is no move orderer
+        :param moves: list of legal moves
+        :param ply: Moves from root
+        :param hash_move: Best move from the transposition table, or None
+        :return: list of moves
+        """
+        if self.orderer is not None:
+            return self.orderer.order_moves(self.position, moves, ply, hash_move)
+        if hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def hash_move(self):
+        """
+        Gets best move stored in the transposition table for the position
+        :return: [from, to, promote], or None if not stored
+        """
+        if self.table is None:
+            return None
+        entry = self.table.probe(self.position.get_key())
+        return entry[3] if entry is not None else None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores a searched position in the transposition table, if there is one
+        :param key: zobrist-key of position
+        :param depth: Depth searched
+        :param score: Score for the player to move
+        :param bound: transposition.EXACT, LOWER or UPPER
+        :param move: Best move found
+        :return:
+        """
+        if self.table is not None:
+            self.table.store(key, depth, score, bound, move)
+
+    def best_child(self, moves):
+        """
+        Evaluates every move with one batched perceptron-call
+        :param moves: list of legal moves
+        :return: best move, score of the best move for the player to move
+        """
+        # Chance of white winning after each move. Moves not in the evaluation cache are predicted in one batch
+        predictions = np.zeros(len(moves), dtype=np.float32)
+        values = np.empty((len(moves), self.accumulator.get_values().shape[0]), dtype=np.float32)
+        keys = []
+        uncached = []
+        draws = []
+        for i in range(len(moves)):
+            self.make_move(moves[i])
+            self.nodes += 1
+            draws.append(self.is_draw())
+            cached = self.lookup_evaluation(self.position.get_key())
+            if cached is None:
+                values[len(keys)] = self.accumulator.get_values()
+                keys.append(self.position.get_key())
+                uncached.append(i)
+            else:
+                predictions[i] = cached
+            self.unmake_move()
+        if uncached:
+            predicted, _ = self.perceptron.predict_accumulated(values[:len(keys)])
+            predictions[uncached] = predicted
+            for i in range(len(keys)):
+                self.store_evaluation(keys[i], float(predicted[i]))
+        if self.position.get_bw() == "w":
+            scores = predictions
+        else:
+            scores = 1.0 - predictions
+        scores = np.where(draws, DRAW, scores)
+        if self.tree is not None and self.path[-1] != position_nodes.NO_NODE:
+            for i in range(len(moves)):
+                node = self.tree.find_child(self.path[-1], moves[i])
+                if node != position_nodes.NO_NODE:
+                    self.tree.set_score(node, 1.0 - scores[i], 0)
+        best = int(np.argmax(scores))
+        return moves[best], float(scores[best])
+
+    def has_noisy_reply(self, move):
+        """
+        Checks if the other player can capture or promote after a move
+        :param move: [from, to, promote]
+        :return: True if the position after the move has to get a quiescence search
+        """
+        self.position.make_move(move)
+        try:
+            for reply in self.position.generate_legal_moves():
+                if not ordering.is_quiet(self.position, reply):
+                    return True
+            return False
+        finally:
+            self.position.unmake_move()
+
+    def is_draw(self):
+        """
+        Checks if the position is a draw by repetition or the 50-move rule.
+        A position that has been seen before in the game or the search counts as a draw
+        :return: True if draw
+        """
+        return self.position.positions_in_game[self.position.get_key()] >= 2 or self.position.half_move >= 100
+
+    def evaluate(self):
+        """
+        Evaluates the position with the perceptron
+        :return: score for the player to move
+        """
+        p = self.lookup_evaluation(self.position.get_key())
+        if p is None:
+            if self.accumulator is None:
+                p, _ = self.perceptron.predict(util.get_data(self.position.get_fen()))
+            else:
+                p, _ = self.perceptron.predict_accumulated(self.accumulator.get_values())
+            self.store_evaluation(self.position.get_key(), float(p))
+        return p if self.position.get_bw() == "w" else 1.0 - p
+
+    def lookup_evaluation(self, key):
+        """
+        Gets a prediction from the evaluation cache, or from the disk cache if it isn't in memory
+        :param key: zobrist-key of the position
+        :return: chance of white winning, None if not cached
+        """
+        p = None
+        if self.eval_cache is not None:
+            p = self.eval_cache.get(key)
+        if p is None and self.disk_cache is not None:
+            p = self.disk_cache.get_evaluation(key, self.weights_id)
+            if p is not None and self.eval_cache is not None:
+                self.eval_cache.put(key, p)
+        return p
+
+    def store_evaluation(self, key, p):
+        """
+        Stores a prediction in the evaluation cache and the disk cache
+        :param key: zobrist-key of the position
+        :param p: chance of white winning
+        :return:
+        """
+        if self.eval_cache is not None:
+            self.eval_cache.put(key, p)
+        if self.disk_cache is not None:
+            self.disk_cache.put_evaluation(key, self.weights_id, p)
+
+    def stored_search(self):
+        """
+        Gets the result of an earlier search of the root from the disk cache
+        :return: depth, score, move as in DiskCache.get_search(), None if not stored or the move isn't legal
+        """
+        if self.disk_cache is None:
+            return None
+        stored = self.disk_cache.get_search(self.position.get_key(), self.weights_id)
+        if stored is None or stored[2] not in self.position.generate_legal_moves():
+            return None
+        return stored
+
+    def make_move(self, move):
+        """
+        Makes move on position and updates accumulator
+        :param move: [from, to, promote]
+        :return:
+        """
+        self.position.make_move(move)
+        added, removed = self.position.last_move_changes()
+        self.accumulator.push(
+            [util.feature_index(*a) for a in added],
+            [util.feature_index(*r) for r in removed]
+        )
+
+    def unmake_move(self):
+        """
+        Takes back last move on position and accumulator
+        :return:
+        """
+        self.position.unmake_move()
+        self.accumulator.pop()
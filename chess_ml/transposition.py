@@ -0,0 +1,146 @@
+import numpy as np
+
+# Bound of a stored score
+EXACT = 0
+LOWER = 1  # Score is at least this (search failed high)
+UPPER = 2  # Score is at most this (search failed low)
+
+PROMOTIONS = [None, "q", "r", "b", "n"]
+NO_MOVE = -1
+
+
+def encode_move(move):
+    """
+    Packs a move into one number
+    :param move: [from, to, promote] or None
+    :return: int
+    """
+    if move is None:
+        return NO_MOVE
+    fr, to, promote = move[0], move[1], move[2]
+    return (PROMOTIONS.index(promote) << 12) | ((fr[0] * 8 + fr[1]) << 6) | (to[0] * 8 + to[1])
+
+
+def decode_move(code):
+    """
+    Unpacks a move packed with encode_move
+    :param code: int
+    :return: [from, to, promote] or None
+    """
+    code = int(code)
+    if code == NO_MOVE:
+        return None
+    fr = (code >> 6) & 63
+    to = code & 63
+    return [[fr >> 3, fr & 7], [to >> 3, to & 7], PROMOTIONS[code >> 12]]
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of searched positions, keyed by zobrist-key.
+    Every bucket has two entries: the first is only replaced by a search at least as deep (or by any search
+    once it is left from an earlier move), the second is always replaced
+    """
+    BUCKET_SIZE = 2
+
+    def __init__(self, size_mb=16):
+        """
+        Initializes table
+        :param size_mb: Megabytes the table can use
+        """
+        self.size_mb = size_mb
+        entry_bytes = (
+            np.dtype(np.uint64).itemsize + np.dtype(np.float32).itemsize + np.dtype(np.int16).itemsize
+            + 3 * np.dtype(np.int8).itemsize
+        )
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (entry_bytes * self.BUCKET_SIZE))
+        entries = self.buckets * self.BUCKET_SIZE
+        self.keys = np.zeros(entries, dtype=np.uint64)
+        self.scores = np.zeros(entries, dtype=np.float32)
+        self.moves = np.full(entries, NO_MOVE, dtype=np.int16)
+        self.depths = np.zeros(entries, dtype=np.int8)
+        self.bounds = np.zeros(entries, dtype=np.int8)
+        self.ages = np.zeros(entries, dtype=np.int8)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        """
+        Removes every entry
+        :return:
+        """
+        self.keys[:] = 0
+        self.moves[:] = NO_MOVE
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """
+        Marks entries stored until now as old and resets hit rate
+        :return:
+        """
+        self.age = (self.age + 1) % 128
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """
+        Looks up a position
+        :param key: zobrist-key
+        :return: depth, score, bound, best move. None if position isn't stored
+        """
+        self.probes += 1
+        i = (key % self.buckets) * self.BUCKET_SIZE
+        for j in range(i, i + self.BUCKET_SIZE):
+            if self.keys[j] == key:
+                self.hits += 1
+                return int(self.depths[j]), float(self.scores[j]), int(self.bounds[j]), decode_move(self.moves[j])
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores a searched position
+        :param key: zobrist-key
+        :param depth: Depth the position was searched to
+        :param score: Score for the player to move
+        :param bound: EXACT, LOWER or UPPER
+        :param move: Best move [from, to, promote], or None
+        :return:
+        """
+        i = (key % self.buckets) * self.BUCKET_SIZE
+        if self.keys[i] == key:
+            j = i
+        elif self.keys[i + 1] == key:
+            # Update the entry already stored, so the position doesn't take both slots
+            j = i + 1
+        elif depth >= self.depths[i] or self.ages[i] != self.age:
+            j = i
+        else:
+            j = i + 1
+        if move is None and self.keys[j] == key:
+            # Keep best move found by an earlier search of the same position
+            move_code = self.moves[j]
+        else:
+            move_code = encode_move(move)
+        self.keys[j] = key
+        self.depths[j] = depth
+        self.scores[j] = score
+        self.bounds[j] = bound
+        self.moves[j] = move_code
+        self.ages[j] = self.age
+
+    def get_hit_rate(self):
+        """
+        Gets share of probes since new_search() that found the position
+        :return: float between 0 and 1
+        """
+        return self.hits / max(self.probes, 1)
+
+    def get_fill(self):
+        """
+        Gets share of entries in use
+        :return: float between 0 and 1
+        """
+        return np.count_nonzero(self.keys) / len(self.keys)
@@ -1,5 +1,6 @@
+import argparse
 from board import game
-from chess_ml import mlplayer
+from chess_ml import mlplayer, limits, checkpoint, learner
 import util.util as util
 import pygame as pg
 from pygame.locals import *
@@ -7,13 +8,14 @@ import numpy as np
 from chess_ml.perceptron import Perceptron
 
 
-def run(b, move_perceptron, promote_perceptron, players):
+def run(b, move_perceptron, promote_perceptron, players, move_learner):
     """
     Run one game
     :param b: Board
     :param move_perceptron: Perceptron for moving
     :param promote_perceptron: Perceptron for promoting
     :param players: List of two players
+    :param move_learner: Learner that trains move_perceptron
     :return:
     """
     move_from = []
@@ -56,10 +58,8 @@ def run(b, move_perceptron, promote_perceptron, players):
                                     or
                                     (color == "b" and players[0].get_color() == "w")
                                 ):  # Asking computer for draw
-                                fen = b.get_fen()
-                                data = util.get_data(fen)
-                                perceptron = Perceptron(fen, "data/weights.npy")
-                                win_prob, _ = perceptron.predict(data)
+                                data = util.get_data(b.get_fen())
+                                win_prob, _ = move_perceptron.predict(data)
                                 if color == "w":
                                     win_prob = 1 - win_prob
                                 if win_prob < 0.5:
@@ -96,6 +96,10 @@ def run(b, move_perceptron, promote_perceptron, players):
                     print()
                     print(b)
 
+                    # Think on the human's time
+                    if b.get_status() == "-" and players[1 if color == "w" else 0].get_color() == "h":
+                        players[0 if color == "w" else 1].start_pondering()
+
                     if color == "w":
                         print("Black to move!!!")
                     elif color == "b":
@@ -106,22 +110,13 @@ def run(b, move_perceptron, promote_perceptron, players):
             else:
                 print("Game finished! Trying to learn from it")
                 print("Learning last position")
-                fen = b.get_fen()
-                data = util.get_data(fen)
-                p, a = move_perceptron.predict(data)
                 if b.get_status() == "w":
                     target_p = 1.0
                 elif b.get_status() == "b":
                     target_p = 0.0
                 else:
                     target_p = 0.5
-                move_perceptron.weights = move_perceptron.back_prop(
-                    a,
-                    p,
-                    target_p
-                )
-                print("Saving weights")
-                util.save_weights(move_perceptron.weights, "data/weights.npy")
+                move_learner.add_sample(b.get_fen(), target_p)
 
                 pg.event.clear()
                 pg.event.post(pg.event.Event(QUIT))
@@ -132,21 +127,76 @@ def run(b, move_perceptron, promote_perceptron, players):
                 break
 
 
+def make_limits(args):
+    """
+    Makes search limits for a player from the command line arguments
+    :param args: Parsed arguments
+    :return: SearchLimits
+    """
+    max_time = args.time
+    if max_time is None and args.clock is None and args.nodes is None and args.depth is None:
+        max_time = 60.0
+    return limits.SearchLimits(
+        max_time=max_time,
+        max_nodes=args.nodes,
+        max_depth=args.depth if args.depth is not None else 64,
+        clock=args.clock,
+        increment=args.increment,
+        quiescence_ply=args.quiescence
+    )
+
+
 def main():
     """
     Starts new game
     :return:
     """
+    parser = argparse.ArgumentParser(description="Plays chess games and learns from them")
+    parser.add_argument("--time", type=float, help="Most seconds for each move. Default is 60 if no other limit is set")
+    parser.add_argument("--nodes", type=int, help="Most nodes to search for each move")
+    parser.add_argument("--depth", type=int, help="Deepest depth to search to")
+    parser.add_argument("--clock", type=float, help="Seconds on each player's clock for the game")
+    parser.add_argument("--increment", type=float, default=0.0, help="Seconds added to the clock after each move")
+    parser.add_argument("--workers", type=int, default=1, help="Processes each player searches with")
+    parser.add_argument("--quiescence", type=int, default=4, help="Most captures and promotions to search after the depth")
+    parser.add_argument("--human", choices=["w", "b"], help="Play against the engine with white or black")
+    parser.add_argument("--ponder", action="store_true", help="Let the engine think while the human is to move")
+    parser.add_argument("--eval-cache", type=int, default=1 << 16, help="Most predictions to keep in the evaluation cache")
+    parser.add_argument("--disk-cache", default="none",
+                        help="File to keep predictions and search-results in between runs, e.g. data/search_cache.npy. "
+                             "Slows the search and only hits while the weights don't change. Default is none")
+    parser.add_argument("--generator", default="bitboard", choices=["objects", "bitboard"],
+                        help="Move generator for the board and the search")
+    parser.add_argument("--checkpoint-interval", type=float, default=30.0,
+                        help="Seconds between saves of the weights. They are only saved if they changed")
+    args = parser.parse_args()
+
     while True:  # Infinite games
         print("Starting new game")
-        g = game.Game()
+        g = game.Game(args.generator)
         b = g.get_board()
         move_perceptron = Perceptron(b.get_fen(), "data/weights.npy")
         promote_perceptron = Perceptron(b.get_fen(), "data/promote_weights.npy")
-        run(b, move_perceptron, promote_perceptron, players=[
-            mlplayer.MlPlayer("w", b, p_tron=move_perceptron, promote_p_tron=promote_perceptron),
-            mlplayer.MlPlayer("b", b, p_tron=move_perceptron, promote_p_tron=promote_perceptron)
-        ])
+        checkpoints = checkpoint.CheckpointWriter(args.checkpoint_interval)
+        checkpoints.watch(move_perceptron, "data/weights.npy")
+        checkpoints.watch(promote_perceptron, "data/promote_weights.npy")
+        # Both players learn with the same perceptron, so they share the learner
+        move_learner = learner.Learner(move_perceptron)
+        players = [
+            mlplayer.MlPlayer(
+                "h" if color == args.human else color, b, p_tron=move_perceptron, promote_p_tron=promote_perceptron,
+                search_limits=make_limits(args), workers=args.workers, ponder=args.ponder,
+                eval_cache_size=args.eval_cache,
+                disk_cache_file=None if args.disk_cache == "none" else args.disk_cache,
+                checkpoints=checkpoints, learner=move_learner
+            ) for color in ["w", "b"]
+        ]
+        run(b, move_perceptron, promote_perceptron, players=players, move_learner=move_learner)
+        for player in players:
+            player.close()
+        move_learner.close()
+        # Saves the weights learned since the last checkpoint, before the next game loads them
+        checkpoints.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+import pytest
+from board.perft import REFERENCE_POSITIONS, perft
+from board.position import Position
+
+MAX_DEPTH = 3
+
+
+@pytest.mark.parametrize("move_generator", ["objects", "bitboard"])
+@pytest.mark.parametrize("name, fen, expected", REFERENCE_POSITIONS, ids=[p[0] for p in REFERENCE_POSITIONS])
+def test_perft(name, fen, expected, move_generator):
+    position = Position(fen, move_generator)
+    for depth in range(1, min(MAX_DEPTH, len(expected)) + 1):
+        assert perft(position, depth) == expected[depth - 1], "{} at depth {}".format(name, depth)
+    assert position.get_fen() == fen
+    assert position.undo_stack == []
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import util.util as util
+from board.position import Position
+from chess_ml import limits, search, transposition
+from chess_ml.perceptron import Perceptron
+
+PIECE_VALUES = {"p": 1, "n": 3, "b": 3, "r": 5, "q": 9, "k": 0}
+
+
+def material_perceptron(fen, bonus_square=None, bonus_piece=None):
+    """
+    Makes a perceptron whose chance of white winning grows with white's material
+    :param fen: fen-string
+    :param bonus_square: [row, col] where bonus_piece gets half a pawn more, None for no bonus
+    :param bonus_piece: Piece that gets the bonus, e.g. "Q"
+    :return: Perceptron
+    """
+    weights = [
+        np.zeros((util.BOARD_FEATURES + 1, 128), dtype=np.float32),
+        np.zeros((129, 64), dtype=np.float32),
+        np.zeros((65, 1), dtype=np.float32),
+    ]
+    for row in range(8):
+        for col in range(8):
+            for piece, value in PIECE_VALUES.items():
+                weights[0][1 + util.feature_index(piece, row, col), 0] = -0.02 * value
+                weights[0][1 + util.feature_index(piece.upper(), row, col), 0] = 0.02 * value
+    if bonus_square is not None:
+        weights[0][1 + util.feature_index(bonus_piece, bonus_square[0], bonus_square[1]), 0] += 0.01
+    # Hidden units are passed on with a weight of 4 and bias 2, so an even position gives 0.5
+    weights[1][0, 0] = 2.0
+    weights[1][1, 0] = 4.0
+    weights[2][0, 0] = 2.0
+    weights[2][1, 0] = 4.0
+    p_tron = Perceptron(fen)
+    p_tron.set_weights(weights)
+    return p_tron
+
+
+def test_quiet_move_that_hangs_the_queen_at_the_horizon():
+    # After h7-h6, Qd1-d5 is white's last move before the horizon. It gets a bonus, but loses the queen to a pawn
+    fen = "4k3/7p/2p1p3/8/8/8/5PPP/3Q2K1 b - - 0 1"
+    position = Position(fen)
+    table = transposition.TranspositionTable(1)
+    s = search.Search(position, material_perceptron(fen, [3, 3], "Q"), limits.SearchLimits(max_depth=2),
+                      table=table)
+    s.score_root_move([[1, 7], [2, 7], None], 2)
+
+    position.make_move([[1, 7], [2, 7], None])
+    entry = table.probe(position.get_key())
+    assert entry is not None
+    assert entry[3] != [[7, 3], [3, 3], None]
+    assert entry[3] != [[7, 3], [1, 3], None]
+
+
+def test_quiet_moves_at_the_horizon_are_searched_like_the_other_moves():
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    p_tron = material_perceptron(fen)
+    s = search.Search(Position(fen), p_tron, limits.SearchLimits(max_depth=2))
+    move, score = s.run()
+
+    class FullSearch(search.Search):
+        def has_noisy_reply(self, move):
+            return True
+
+    full = FullSearch(Position(fen), p_tron, limits.SearchLimits(max_depth=2))
+    assert score == pytest.approx(full.run()[1])
@@ -0,0 +1,42 @@
+import argparse
+import shutil
+import numpy as np
+import util.util as util
+
+
+def convert(file, backup=False):
+    """
+    Converts a weight-file from the old pickled format to the current format. The weights become float32
+    :param file: .npy-file
+    :param backup: Copy the old file to file + ".bak" first
+    :return: True if the file was converted, False if it already has the current format
+    """
+    if util.get_weights_format(file) == util.WEIGHTS_FORMAT:
+        return False
+    weights = [np.asarray(w, dtype=np.float32) for w in np.load(file, allow_pickle=True)]
+    if backup:
+        shutil.copyfile(file, file + ".bak")
+    util.save_weights(weights, file)
+    converted = util.read_weights(file, mmap_mode=None)
+    for old, new in zip(weights, converted):
+        if not np.array_equal(old, new):
+            raise Exception("Weights in {} changed when converting".format(file))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts pickled weight-files to the memory-mappable format")
+    parser.add_argument("files", nargs="*", default=["data/weights.npy", "data/promote_weights.npy"],
+                        help="Weight-files to convert")
+    parser.add_argument("--backup", action="store_true", help="Keep the old files as <file>.bak")
+    args = parser.parse_args()
+
+    for file in args.files:
+        if convert(file, args.backup):
+            print("Converted {}, layer sizes: {}".format(file, np.load(file, mmap_mode="r")["layer_sizes"][0].tolist()))
+        else:
+            print("{} already has format {}".format(file, util.WEIGHTS_FORMAT))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import json
+import os
+import tempfile
+import zlib
 import numpy as np
 import random
 
@@ -15,57 +18,77 @@ piece_dict = {"p": PAWN, "n": KNIGHT, "b": BISHOP, "r": ROOK, "q": QUEEN, "k": K
 letter_list = ["a", "b", "c", "d", "e", "f", "g", "h"]
 
 
-def add_piece_to_list(piece):
-    """
-    Adds piece to list of data
-    Return-list is structured like this:
-    [
-        black pawn,
-        white pawn,
-        black knight,
-        white knight,
-        black bishop,
-        white bishop,
-        black rook,
-        white rook,
-        black queen,
-        white queen,
-        black king,
-        white king
-    ]
+# Index of each piece among the 12 values for a square. Same order as piece_dict, black before white:
+# black pawn, white pawn, black knight, white knight, ..., black king, white king
+PIECE_PLANE = {"p": 0, "P": 1, "n": 2, "N": 3, "b": 4, "B": 5, "r": 6, "R": 7, "q": 8, "Q": 9, "k": 10, "K": 11}
+PLANES = 12
+BOARD_FEATURES = 64 * PLANES
+PROMOTE_FEATURES = 8
+
+# Version of the weight-file format. 1: one record with a header (format, layer sizes, checksum)
+# and a float32-matrix for each layer. 0 is the old pickled object-array of float64-matrices
+WEIGHTS_FORMAT = 1
+
+
+def fen_to_indices(fen):
+    """
+    Gets index of every non-zero value in the perceptron-data for a fen-string
+    :param fen: fen-string (only the piece-placement is used)
+    :return: list of indices
+    """
+    indices = []
+    square = 0
+    for c in fen.split(" ", 1)[0]:
+        if c in PIECE_PLANE:
+            indices.append(square * PLANES + PIECE_PLANE[c])
+            square += 1
+        elif c != "/":
+            square += int(c)
+    return indices
+
+
+def feature_index(piece, row, col):
+    """
+    Gets index of the perceptron-input for a piece on a square
     :param piece: Character of piece from fen
-    :return: List of pieces for current square
+    :param row: Row of square in board-array
+    :param col: Column of square in board-array
+    :return: index
     """
-    piece_list = [0 for _ in range(12)]
-    if piece.islower():
-        piece_list[(piece_dict[piece.lower()] - 1) * 2] = 1
-    elif piece.isupper():
-        piece_list[(piece_dict[piece.lower()] * 2) - 1] = 1
-    return piece_list
+    return (row * 8 + col) * PLANES + PIECE_PLANE[piece]
 
 
-def fen_to_list(fen):
+def fen_to_array(fen, out=None):
     """
-    Makes fen-string to a list for use with perceptron
+    Makes fen-string to an array for use with perceptron.
+    Every square gets 12 values (see PIECE_PLANE), squares are ordered like in the fen-string
     :param fen: fen-string
-    :return: a list
-    """
-    fen_list = fen.split()
-    value_list = []
-    # Board
-    for c in fen_list[0]:
-        if c.lower() in piece_dict:
-            for p in add_piece_to_list(c):
-                value_list.append(p)
-        try:
-            number = int(c)
-            for _ in range(number):
-                for _ in range(12):
-                    value_list.append(0)
-        except ValueError:
-            pass
-
-    return value_list
+    :param out: Preallocated array with room for BOARD_FEATURES values. A new float32-array is made if None
+    :return: out
+    """
+    if out is None:
+        out = np.zeros(BOARD_FEATURES, dtype=np.float32)
+    else:
+        out[:BOARD_FEATURES] = 0
+    out[fen_to_indices(fen)] = 1
+    return out
+
+
+def fens_to_array(positions, out=None):
+    """
+    Makes many positions to a 2d-array for use with perceptron, one position per row
+    :param positions: list of fen-strings or boards (anything with get_fen())
+    :param out: Preallocated array with shape (len(positions), BOARD_FEATURES). A new float32-array is made if None
+    :return: out
+    """
+    if out is None:
+        out = np.zeros((len(positions), BOARD_FEATURES), dtype=np.float32)
+    else:
+        out[:, :BOARD_FEATURES] = 0
+    for i in range(len(positions)):
+        fen = positions[i] if isinstance(positions[i], str) else positions[i].get_fen()
+        out[i, fen_to_indices(fen)] = 1
+    return out
 
 
 def move_from_to(pos, move):
@@ -122,50 +145,100 @@ def get_data(fen):
     """
     Gets data for use with perceptron
     :param fen: fen-string from chess-game
-    :return: a list for perceptron
+    :return: a float32-array for perceptron
     """
-    return fen_to_list(fen)
+    return fen_to_array(fen)
 
 
 def get_promote_data(fen, piece):
     """
     Gets data for promotion
     :param fen: fen-string
-    :param piece: which piece to promote to. "n", "b", "r" or "q"
-    :return: a list for promote-perceptron
-    """
-    ret_list = fen_to_list(fen)
-    promote_list = [0 for _ in range(8)]
-    if piece.lower() == "n":
-        if piece.islower():
-            promote_list[0] = 1
-        else:
-            promote_list[1] = 1
-    elif piece.lower() == "b":
-        if piece.islower():
-            promote_list[2] = 1
-        else:
-            promote_list[3] = 1
-    elif piece.lower() == "r":
-        if piece.islower():
-            promote_list[4] = 1
-        else:
-            promote_list[5] = 1
-    elif piece.lower() == "q":
-        if piece.islower():
-            promote_list[6] = 1
+    :param piece: which piece to promote to. "n", "b", "r" or "q" (uppercase for white)
+    :return: a float32-array for promote-perceptron
+    """
+    if len(piece) != 1 or piece.lower() not in "nbrq":
+        raise ValueError("Can only promote to \"n\", \"b\", \"r\" or \"q\", you tried " + str(piece))
+    data = np.zeros(BOARD_FEATURES + PROMOTE_FEATURES, dtype=np.float32)
+    fen_to_array(fen, data)
+    # Knight is the first piece that can be promoted to
+    data[BOARD_FEATURES + PIECE_PLANE[piece] - PIECE_PLANE["n"]] = 1
+    return data
+
+
+def weights_dtype(shapes):
+    """
+    Gets the record-type of a weight-file: the header, then one float32-matrix per layer
+    :param shapes: list of shapes of the weight-matrices
+    :return: numpy-dtype
+    """
+    fields = [
+        ("format", "<u4"),
+        ("layer_sizes", "<u4", (len(shapes) + 1,)),
+        ("checksum", "<u4"),
+    ]
+    for i in range(len(shapes)):
+        fields.append(("layer_{}".format(i), "<f4", tuple(shapes[i])))
+    return np.dtype(fields)
+
+
+def weights_checksum(weights):
+    """
+    Gets checksum of weights as float32
+    :param weights: list of weight-matrices
+    :return: 32-bit int
+    """
+    checksum = 0
+    for w in weights:
+        checksum = zlib.crc32(np.ascontiguousarray(w, dtype=np.float32).tobytes(), checksum)
+    return checksum
+
+
+def get_weights_format(file):
+    """
+    Gets format-version of a weight-file without loading it
+    :param file: .npy-file
+    :return: WEIGHTS_FORMAT for the current format, 0 for the old format (pickled object-array)
+    """
+    with open(file, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            _, _, dtype = np.lib.format.read_array_header_1_0(f)
         else:
-            promote_list[7] = 1
-    for p in promote_list:
-        ret_list.append(p)
-    return ret_list
+            _, _, dtype = np.lib.format.read_array_header_2_0(f)
+    if dtype.hasobject:
+        return 0
+    if dtype.names is None or "format" not in dtype.names:
+        raise ValueError("{} is not a weight-file".format(file))
+    return int(np.load(file, mmap_mode="r")["format"][0])
+
+
+def read_weights(file, mmap_mode="r", verify=True):
+    """
+    Reads weights in the current format. The matrices are views of the memory-mapped file,
+    so processes reading the same file share one copy of it
+    :param file: .npy-file
+    :param mmap_mode: "r" to map the file read-only, None to read it into memory
+    :param verify: Check the checksum in the header
+    :return: list of float32 weight-matrices
+    """
+    records = np.load(file, mmap_mode=mmap_mode)
+    if records.dtype.names is None or "format" not in records.dtype.names:
+        raise ValueError("{} is not a weight-file".format(file))
+    if records["format"][0] != WEIGHTS_FORMAT:
+        raise ValueError("{} has format {}, expected {}".format(file, records["format"][0], WEIGHTS_FORMAT))
+    # Plain ndarray-views of the file, indexing a memmap-object is slower
+    weights = [np.asarray(records["layer_{}".format(i)][0]) for i in range(len(records["layer_sizes"][0]) - 1)]
+    if verify and weights_checksum(weights) != records["checksum"][0]:
+        raise ValueError("Checksum of {} doesn't match its weights".format(file))
+    return weights
 
 
 def get_weights(file, layer_sizes=None):
     """
-    Get weights from json-file. Makes new weights if file doesn't exist or is empty
+    Get weights from file. Makes new weights if file doesn't exist
     :param layer_sizes: Layer sizes if weights is not initialized. Default is None (for testing)
-    :param file: json-file (String)
+    :param file: .npy-file (String)
     :return: list of weights
     """
     # For testing
@@ -173,26 +246,44 @@ def get_weights(file, layer_sizes=None):
         layer_sizes = np.array([6, 4, 1])
 
     depth = len(layer_sizes)
-    try:
-        weights = np.load(file, allow_pickle=True)
-    except FileNotFoundError:
+    if not os.path.exists(file):
         new_weights = []
         for i in range(depth - 1):
             new_weights.append(np.random.randn(layer_sizes[i] + 1, layer_sizes[i+1]) * 0.1)
-        new_weights = np.array(new_weights, dtype=object)
-        np.save(file, new_weights)
-        weights = np.load(file, allow_pickle=True)
-    return weights
+        save_weights(new_weights, file)
+    if get_weights_format(file) == 0:
+        print("{} is in the old pickled format. Convert it with: python -m util.convert_weights".format(file))
+        return list(np.load(file, allow_pickle=True))
+    return read_weights(file)
 
 
 def save_weights(weights, file):
     """
-    Save weights to file
-    :param weights: weights to save
+    Save weights to file. Writes to a temporary file that replaces the file when done,
+    so processes that have the old file memory-mapped keep reading the old weights
+    :param weights: list of weight-matrices to save
     :param file: file to save to. will make a new file if it doesn't exist
     :return:
     """
-    np.save(file, weights)
+    shapes = [np.shape(w) for w in weights]
+    records = np.zeros(1, dtype=weights_dtype(shapes))
+    records["format"] = WEIGHTS_FORMAT
+    records["layer_sizes"][0] = [shapes[0][0] - 1] + [shape[1] for shape in shapes]
+    records["checksum"] = weights_checksum(weights)
+    for i in range(len(weights)):
+        records["layer_{}".format(i)][0] = weights[i]
+    # A temporary file of its own in the same directory, so writers don't share it and the rename is atomic
+    handle, temp_file = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(file)))
+    try:
+        with os.fdopen(handle, "wb") as f:
+            np.save(f, records)
+            # The data has to be on disk before the rename, or a crash can leave a renamed, truncated file
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
 
 
 def add_bias(data):